@@ -7,7 +7,7 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from ...security.auth import auth_manager, get_current_user
 from ...security.models import (
     LoginRequest, LoginResponse, RefreshTokenRequest, 
-    PasswordChangeRequest, UserCreate, User, UserRole, ROLE_PERMISSIONS
+    PasswordChangeRequest, UserCreate, User, UserRole, ROLE_PERMISSIONS, LightUser
 )
 from ...security.security import (
     hash_password, verify_password, validate_password, validate_username, 
@@ -413,6 +413,8 @@ async def get_current_user_info(
     
     # Try to get user from request state first (set by middleware)
     user_from_state = getattr(request.state, 'user', None)
+    if isinstance(user_from_state, LightUser):
+        user_from_state = user_from_state.to_user()
     
     # If no user in state, try to authenticate directly
     if not user_from_state:
@@ -26,6 +26,7 @@ from ...services import rag_agent, background_webhook_service, rag_engine
 from ...services.streaming_service import streaming_service, StreamFormat, StreamEventType
 from ...services.agent_orchestrator import agent_orchestrator, AgentType
 from ...services.advanced_rag_engine import advanced_rag_engine, SearchAlgorithm
+from ...services.rag_engine import bump_corpus_version
 from ...core.config import settings
 from ...security.auth import get_current_user, verify_api_key, require_permission
 from ...security.models import User, APIKey, Permission
@@ -702,6 +703,7 @@ async def delete_all_documents(
         # Delete all documents
         delete_query = "DELETE FROM documents"
         await db_manager.execute_query(delete_query)
+        bump_corpus_version()
         
         return {
             "message": f"Successfully deleted {total_documents} documents",
@@ -735,6 +737,7 @@ async def delete_document(
         # Delete the document
         delete_query = "DELETE FROM documents WHERE id = $1"
         await db_manager.execute_query(delete_query, document_id)
+        bump_corpus_version()
         
         return {
             "message": "Document deleted successfully",
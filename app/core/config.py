@@ -31,6 +31,7 @@ class Settings(BaseSettings):
     openai_model: str = Field(default="gpt-4-turbo-preview")
     openai_embedding_model: str = Field(default="text-embedding-3-small")
     openai_assistant_id: Optional[str] = Field(default=None)
+    openai_max_concurrency: int = Field(default=16)  # Concurrent Assistants API requests per executor
     
     # Query Classification
     complex_query_keywords: List[str] = Field(
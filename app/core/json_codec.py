@@ -0,0 +1,43 @@
+"""
+Shared JSON encode/decode helpers.
+
+orjson is several times faster than the stdlib json module on large payloads
+(search results, tool outputs, cached entries); it is optional, so the stdlib
+is used when it is not installed. orjson.JSONDecodeError subclasses
+json.JSONDecodeError, so callers can keep catching the stdlib exception.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+__all__ = ["HAS_ORJSON", "loads", "dumps", "dumps_bytes"]
+
+if HAS_ORJSON:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    loads = orjson.loads
+    
+    def dumps_bytes(value: Any) -> bytes:
+        """Encode to UTF-8 JSON bytes; numpy values and non-str keys are supported"""
+        return orjson.dumps(value, default=str, option=_OPTIONS)
+    
+    def dumps(value: Any) -> str:
+        """Encode to a JSON string"""
+        return orjson.dumps(value, default=str, option=_OPTIONS).decode()
+else:
+    loads = json.loads
+    
+    def dumps_bytes(value: Any) -> bytes:
+        """Encode to UTF-8 JSON bytes"""
+        return json.dumps(value, default=str).encode()
+    
+    def dumps(value: Any) -> str:
+        """Encode to a JSON string"""
+        return json.dumps(value, default=str)
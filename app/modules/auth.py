@@ -12,6 +12,7 @@ import asyncio
 from typing import Dict, Any, Optional
 from ..core.modules import BaseModule, ModuleConfig, ModuleStatus
 from ..security.auth import create_access_token, verify_token, get_current_user
+from ..security.security import start_security_event_worker, stop_security_event_worker
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -46,6 +47,9 @@ class AuthModule(BaseModule):
             # Verify test token
             verify_token(test_token, self._jwt_secret, self._jwt_algorithm)
             
+            # Deliver security events from a background task instead of the request path
+            start_security_event_worker()
+            
             self._set_status(ModuleStatus.ACTIVE)
             logger.info("Authentication module initialized successfully")
             
@@ -59,7 +63,8 @@ class AuthModule(BaseModule):
         self._set_status(ModuleStatus.SHUTTING_DOWN)
         
         try:
-            # No specific shutdown needed for auth
+            # Flush and stop the security event worker
+            await stop_security_event_worker()
             self._set_status(ModuleStatus.SHUTDOWN)
             logger.info("Authentication module shut down successfully")
             
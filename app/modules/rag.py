@@ -159,6 +159,8 @@ class RAGModule(BaseModule):
         self._core_rag_ready = False
     
     async def _shutdown_advanced_rag(self) -> None:
+        # Flush and stop the batched result cache writer
+        await advanced_rag_engine.stop_cache_writer()
         self._advanced_rag_ready = False
     
     async def _shutdown_agents(self) -> None:
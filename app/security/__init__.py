@@ -18,7 +18,8 @@ from .security import (
 from .middleware import (
     security_middleware,
     authentication_middleware,
-    authorization_middleware
+    authorization_middleware,
+    unified_security_middleware
 )
 
 __all__ = [
@@ -40,5 +41,6 @@ __all__ = [
     "verify_password",
     "security_middleware",
     "authentication_middleware",
-    "authorization_middleware"
+    "authorization_middleware",
+    "unified_security_middleware"
 ] 
\ No newline at end of file
@@ -9,7 +9,7 @@ import logging
 from ..core.config import settings
 from ..core.database import db_manager
 from .models import User, APIKey, UserRole, Permission, TokenData, ROLE_PERMISSIONS
-from .security import verify_password, hash_api_key, security_manager, log_security_event
+from .security import verify_password, verify_api_key as verify_api_key_hash, security_manager, log_security_event
 
 logger = logging.getLogger(__name__)
 
@@ -34,16 +34,17 @@ class AuthManager:
         """Create JWT access token"""
         try:
             to_encode = data.copy()
+            now = datetime.utcnow()
             
             if expires_delta:
-                expire = datetime.utcnow() + expires_delta
+                expire = now + expires_delta
             else:
-                expire = datetime.utcnow() + timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+                expire = now + timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
             
             to_encode.update({
                 "exp": expire,
                 "type": "access",
-                "iat": datetime.utcnow(),
+                "iat": now,
                 "jti": secrets.token_urlsafe(16)  # Unique token ID
             })
             
@@ -62,12 +63,13 @@ class AuthManager:
     def create_refresh_token(self, data: Dict[str, Any]) -> str:
         """Create JWT refresh token"""
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=JWT_REFRESH_TOKEN_EXPIRE_DAYS)
+        now = datetime.utcnow()
+        expire = now + timedelta(days=JWT_REFRESH_TOKEN_EXPIRE_DAYS)
         
         to_encode.update({
             "exp": expire,
             "type": "refresh",
-            "iat": datetime.utcnow(),
+            "iat": now,
             "jti": secrets.token_urlsafe(16)
         })
         
@@ -157,8 +159,11 @@ class AuthManager:
                 )
                 return None
             
+            # One timestamp for every time check in this login attempt
+            now = datetime.utcnow()
+            
             # Check if user is locked
-            if user.is_locked():
+            if user.is_locked(now):
                 log_security_event(
                     "locked_user_login_attempt",
                     f"Login attempt by locked user: {username}",
@@ -186,7 +191,7 @@ class AuthManager:
                 # Record failed attempt
                 user.login_attempts += 1
                 if user.login_attempts >= 5:
-                    user.locked_until = datetime.utcnow() + timedelta(hours=1)
+                    user.locked_until = now + timedelta(hours=1)
                     log_security_event(
                         "user_account_locked",
                         f"User account locked due to failed attempts: {username}",
@@ -229,7 +234,7 @@ class AuthManager:
             # Successful login - clear failed attempts
             user.login_attempts = 0
             user.locked_until = None
-            user.last_login = datetime.utcnow()
+            user.last_login = now
             await self._update_user(user)
             
             if ip_address:
@@ -281,6 +286,9 @@ class AuthManager:
                 )
                 return None
             
+            # One timestamp for every time check in this request
+            now = datetime.utcnow()
+            
             # Check if API key is active
             if not api_key_obj.is_active:
                 log_security_event(
@@ -295,7 +303,7 @@ class AuthManager:
             # Check if API key is expired
             if api_key_obj.expires_at:
                 # Ensure both datetimes are timezone-aware for comparison
-                current_time = datetime.utcnow().replace(tzinfo=None)
+                current_time = now
                 expires_at = api_key_obj.expires_at.replace(tzinfo=None) if api_key_obj.expires_at.tzinfo else api_key_obj.expires_at
                 if expires_at < current_time:
                     log_security_event(
@@ -362,7 +370,7 @@ class AuthManager:
                     return None
             
             # Update usage statistics
-            api_key_obj.last_used = datetime.utcnow()
+            api_key_obj.last_used = now
             api_key_obj.usage_count += 1
             await self._update_api_key(api_key_obj)
             
@@ -382,7 +390,7 @@ class AuthManager:
     
     def _verify_api_key_secret(self, secret: str, hashed_secret: str) -> bool:
         """Verify API key secret"""
-        return hash_api_key(secret) == hashed_secret
+        return verify_api_key_hash(secret, hashed_secret)
     
     async def _get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username from database"""
@@ -391,13 +399,7 @@ class AuthManager:
             result = await db_manager.execute_one(query, username)
             
             if result:
-                # Ensure role is properly converted to enum
-                if isinstance(result.get("role"), str):
-                    try:
-                        result["role"] = UserRole(result["role"])
-                    except ValueError:
-                        result["role"] = UserRole.USER
-                return User(**result)
+                return User.from_db_row(result)
             return None
         except Exception as e:
             logger.error(f"Error getting user by username: {e}")
@@ -410,13 +412,7 @@ class AuthManager:
             result = await db_manager.execute_one(query, user_id)
             
             if result:
-                # Ensure role is properly converted to enum
-                if isinstance(result.get("role"), str):
-                    try:
-                        result["role"] = UserRole(result["role"])
-                    except ValueError:
-                        result["role"] = UserRole.USER
-                return User(**result)
+                return User.from_db_row(result)
             return None
         except Exception as e:
             logger.error(f"Error getting user by ID: {e}")
@@ -429,7 +425,7 @@ class AuthManager:
             result = await db_manager.execute_one(query, key_id)
             
             if result:
-                return APIKey(**result)
+                return APIKey.from_db_row(result)
             return None
         except Exception as e:
             logger.error(f"Error getting API key: {e}")
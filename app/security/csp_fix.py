@@ -1,6 +1,4 @@
-from fastapi import Request
-from fastapi.responses import Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 
 def create_swagger_friendly_csp() -> str:
     """Create CSP that allows Swagger UI to work"""
@@ -14,18 +12,23 @@ def create_swagger_friendly_csp() -> str:
         "frame-ancestors 'none';"
     )
 
-class CSPMiddleware(BaseHTTPMiddleware):
-    """Content Security Policy middleware"""
+class CSPMiddleware:
+    """Content Security Policy middleware (raw ASGI)"""
     
     def __init__(self, app, csp_header: str = None):
-        super().__init__(app)
+        self.app = app
         self.csp_header = csp_header or create_swagger_friendly_csp()
     
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
+    async def __call__(self, scope, receive, send):
+        # Set CSP header for documentation pages only; everything else passes straight through
+        if scope["type"] != "http" or scope["path"] not in ("/docs", "/redoc", "/openapi.json"):
+            await self.app(scope, receive, send)
+            return
         
-        # Set CSP header for documentation pages
-        if request.url.path in ["/docs", "/redoc", "/openapi.json"]:
-            response.headers["Content-Security-Policy"] = self.csp_header
+        async def send_with_csp(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["Content-Security-Policy"] = self.csp_header
+            await send(message)
         
-        return response 
\ No newline at end of file
+        await self.app(scope, receive, send_with_csp) 
\ No newline at end of file
@@ -1,38 +1,161 @@
+import re
+import json
 import time
 import logging
 import os
-from typing import Callable, Optional
+from typing import NamedTuple, Optional
 from fastapi import Request, Response, HTTPException, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 from ..core.config import settings
 
 from .security import (
     security_manager, 
-    validate_input, 
+    validate_input_bytes,
     sanitize_input, 
     create_security_headers,
     log_security_event,
     validate_ip_address
 )
 from .auth import auth_manager, get_current_user, verify_api_key
-from .models import User, UserRole
+from .models import LightUser, UserRole
 
 logger = logging.getLogger(__name__)
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Comprehensive security middleware"""
+# Token role strings -> UserRole, accepting enum values ("admin"), enum
+# names ("ADMIN") and the stringified enum form ("UserRole.ADMIN")
+_ROLE_MAP = (
+    {r.value: r for r in UserRole}
+    | {r.name: r for r in UserRole}
+    | {f"UserRole.{r.name}": r for r in UserRole}
+)
+
+class _RequestHeaders(NamedTuple):
+    """Request headers the security middlewares need, pulled out in one pass"""
+    forwarded_for: Optional[str]
+    real_ip: Optional[str]
+    authorization: Optional[str]
+    api_key: Optional[str]
+    user_agent: Optional[str]
+    cors_request_method: Optional[str]  # Only sent on CORS preflights
+    injected_header: Optional[str]  # First header whose value contains CR/LF
+
+def _extract_headers(scope) -> _RequestHeaders:
+    """Scan the raw ASGI header list once (names are already lowercased bytes)"""
+    forwarded_for = real_ip = authorization = api_key = user_agent = None
+    cors_request_method = injected_header = None
+    for name, value in scope["headers"]:
+        if injected_header is None and (b"\r" in value or b"\n" in value):
+            injected_header = name.decode("latin-1")
+        # Keep the first occurrence, matching Headers.get
+        if name == b"x-forwarded-for":
+            if forwarded_for is None:
+                forwarded_for = value.decode("latin-1")
+        elif name == b"x-real-ip":
+            if real_ip is None:
+                real_ip = value.decode("latin-1")
+        elif name == b"authorization":
+            if authorization is None:
+                authorization = value.decode("latin-1")
+        elif name == b"x-api-key":
+            if api_key is None:
+                api_key = value.decode("latin-1")
+        elif name == b"user-agent":
+            if user_agent is None:
+                user_agent = value.decode("latin-1")
+        elif name == b"access-control-request-method":
+            if cors_request_method is None:
+                cors_request_method = value.decode("latin-1")
+    return _RequestHeaders(
+        forwarded_for, real_ip, authorization, api_key, user_agent, cors_request_method, injected_header
+    )
+
+def _request_headers(request: Request) -> _RequestHeaders:
+    """Extracted headers for this request, computed once and cached on request.state"""
+    headers = getattr(request.state, "security_headers", None)
+    if headers is None:
+        headers = _extract_headers(request.scope)
+        request.state.security_headers = headers
+    return headers
+
+def _resolve_client_ip(request: Request) -> Optional[str]:
+    """Extract client IP address"""
+    headers = _request_headers(request)
+    
+    # Check X-Forwarded-For header (from load balancer/proxy)
+    if headers.forwarded_for:
+        # Take the first IP (original client)
+        client_ip = headers.forwarded_for.split(",")[0].strip()
+        if validate_ip_address(client_ip):
+            return client_ip
+    
+    # Check X-Real-IP header
+    if headers.real_ip and validate_ip_address(headers.real_ip):
+        return headers.real_ip
+    
+    # Fall back to direct connection IP
+    if hasattr(request.client, "host"):
+        return request.client.host
+    
+    return None
+
+# Security headers pre-encoded once for direct injection into the ASGI
+# response start message (names lowercased as in Starlette raw headers)
+_SECURITY_HEADERS_RAW = [
+    (name.lower().encode("latin-1"), value.encode("latin-1"))
+    for name, value in create_security_headers().items()
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in _SECURITY_HEADERS_RAW)
+
+def _encode_json(content) -> bytes:
+    """Serialize like JSONResponse.render, for bodies encoded once at import"""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+# Fixed deny responses are serialized once instead of on every rejected request
+_IP_BLOCKED_BODY = _encode_json({"error": "Access denied", "code": "IP_BLOCKED"})
+_RATE_LIMITED_BODY = _encode_json({"error": "Rate limit exceeded", "code": "RATE_LIMITED"})
+_AUTHENTICATION_REQUIRED_BODY = _encode_json({
+    "error": "Authentication required",
+    "code": "AUTHENTICATION_REQUIRED"
+})
+_RATE_LIMITED_HEADERS = {**create_security_headers(), "Retry-After": "60"}
+_AUTHENTICATION_REQUIRED_HEADERS = {**create_security_headers(), "WWW-Authenticate": "Bearer"}
+
+class SecurityMiddleware:
+    """Comprehensive security middleware (raw ASGI)"""
     
     def __init__(self, app, enable_rate_limiting: bool = True, enable_ip_blocking: bool = True):
-        super().__init__(app)
+        self.app = app
         self.enable_rate_limiting = enable_rate_limiting
         self.enable_ip_blocking = enable_ip_blocking
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_status = None
+        
+        async def send_with_security_headers(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                if _SECURITY_HEADERS_RAW:
+                    # Replace rather than duplicate headers the app already set
+                    message["headers"] = [
+                        header for header in message.get("headers", [])
+                        if header[0].lower() not in _SECURITY_HEADER_NAMES
+                    ] + _SECURITY_HEADERS_RAW
+            await send(message)
+        
+        request = Request(scope, receive)
         
-        # Get client IP
+        start_time = time.perf_counter()
+        
+        # Get client IP once and share it with the helpers and downstream middleware
         client_ip = self._get_client_ip(request)
+        request.state.client_ip = client_ip
         
         try:
             # 1. IP Blocking Check
@@ -40,74 +163,94 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                 if security_manager.is_ip_blocked(client_ip):
                     log_security_event(
                         "blocked_ip_request",
-                        f"Request from blocked IP: {client_ip}",
+                        "Request from blocked IP: %s",
                         "high",
+                        client_ip,
                         ip_address=client_ip,
                         endpoint=str(request.url),
                         method=request.method
                     )
-                    return JSONResponse(
+                    response = Response(
+                        content=_IP_BLOCKED_BODY,
                         status_code=status.HTTP_403_FORBIDDEN,
-                        content={"error": "Access denied", "code": "IP_BLOCKED"},
+                        media_type="application/json",
                         headers=create_security_headers()
                     )
+                    await response(scope, receive, send)
+                    return
+            
+            # CORS preflights carry no credentials or body; once the IP is allowed,
+            # skip rate-limit and input checks and only attach the security headers
+            if request.method == "OPTIONS" and _request_headers(request).cors_request_method:
+                await self.app(scope, receive, send_with_security_headers)
+                return
             
             # 2. Rate Limiting
             if self.enable_rate_limiting and client_ip:
                 if not self._check_rate_limits(request, client_ip):
                     log_security_event(
                         "rate_limit_exceeded",
-                        f"Rate limit exceeded for IP: {client_ip}",
+                        "Rate limit exceeded for IP: %s",
                         "medium",
+                        client_ip,
                         ip_address=client_ip,
                         endpoint=str(request.url),
                         method=request.method
                     )
-                    return JSONResponse(
+                    response = Response(
+                        content=_RATE_LIMITED_BODY,
                         status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        content={"error": "Rate limit exceeded", "code": "RATE_LIMITED"},
-                        headers={
-                            **create_security_headers(),
-                            "Retry-After": "60"
-                        }
+                        media_type="application/json",
+                        headers=_RATE_LIMITED_HEADERS
                     )
+                    await response(scope, receive, send)
+                    return
             
             # 3. Input Validation for POST/PUT/PATCH requests
             if request.method in ["POST", "PUT", "PATCH"]:
                 await self._validate_request_input(request)
+                receive = self._replay_body(request, receive)
             
             # 4. Security Headers Check
             self._validate_request_headers(request)
             
-            # Process request
-            response = await call_next(request)
-            
-            # 5. Add security headers to response
-            security_headers = create_security_headers()
-            for header, value in security_headers.items():
-                response.headers[header] = value
+            # 5. Access control (no-op here, see UnifiedSecurityMiddleware)
+            denied = await self._check_access(request)
+            if denied is not None:
+                await denied(scope, receive, send)
+                return
             
-            # 6. Log successful request
-            processing_time = time.time() - start_time
-            self._log_request(request, response, processing_time, client_ip)
+            # Process request; 6. security headers are added by the send wrapper
+            await self.app(scope, receive, send_with_security_headers)
             
-            return response
+            # 7. Log successful request
+            processing_time = time.perf_counter() - start_time
+            self._log_request(request, response_status, processing_time, client_ip)
         
         except HTTPException as e:
+            if response_status is not None:
+                raise
+            
             # Handle HTTP exceptions with security headers
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=e.status_code,
                 content={"error": e.detail, "code": "HTTP_EXCEPTION"},
                 headers=create_security_headers()
             )
+            await response(scope, receive, send)
         
         except Exception as e:
+            # The response has already started; nothing can be sent in its place
+            if response_status is not None:
+                raise
+            
             # Handle unexpected errors
             logger.error(f"Security middleware error: {e}")
             log_security_event(
                 "middleware_error",
-                f"Security middleware error: {str(e)}",
+                "Security middleware error: %s",
                 "high",
+                e,
                 ip_address=client_ip,
                 endpoint=str(request.url),
                 method=request.method
@@ -115,39 +258,45 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             
             # In debug mode, return a more informative error
             if getattr(settings, 'debug', False):
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     content={"error": "Security middleware error", "details": str(e), "code": "MIDDLEWARE_ERROR"},
                     headers=create_security_headers()
                 )
             else:
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     content={"error": "Internal server error", "code": "MIDDLEWARE_ERROR"},
                     headers=create_security_headers()
                 )
+            await response(scope, receive, send)
     
-    def _get_client_ip(self, request: Request) -> Optional[str]:
-        """Extract client IP address"""
-        # Check X-Forwarded-For header (from load balancer/proxy)
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            # Take the first IP (original client)
-            client_ip = forwarded_for.split(",")[0].strip()
-            if validate_ip_address(client_ip):
-                return client_ip
-        
-        # Check X-Real-IP header
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip and validate_ip_address(real_ip):
-            return real_ip
-        
-        # Fall back to direct connection IP
-        if hasattr(request.client, "host"):
-            return request.client.host
+    @staticmethod
+    def _replay_body(request: Request, receive):
+        """Return a receive callable that replays a body already consumed by validation"""
+        body = getattr(request, "_body", None)
+        if body is None:
+            return receive
+        
+        body_sent = False
+        
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
         
+        return replay_receive
+    
+    async def _check_access(self, request: Request) -> Optional[Response]:
+        """Hook for authentication/authorization; return a response to deny the request"""
         return None
     
+    def _get_client_ip(self, request: Request) -> Optional[str]:
+        """Extract client IP address"""
+        return _resolve_client_ip(request)
+    
     def _check_rate_limits(self, request: Request, client_ip: str) -> bool:
         """Check various rate limits"""
         # Skip rate limiting in test mode or debug mode with relaxed security
@@ -181,84 +330,69 @@ class SecurityMiddleware(BaseHTTPMiddleware):
     
     async def _validate_request_input(self, request: Request):
         """Validate request input for security threats"""
-        try:
-            # Skip aggressive validation in test mode or debug mode with relaxed security
-            if (getattr(settings, 'test_mode', False) or 
-                (getattr(settings, 'debug', False) and getattr(settings, 'relaxed_security_in_debug', True))):
-                # In test/debug mode, be less aggressive with validation
-                return
-            
-            # Skip validation for documentation and health endpoints
-            if request.url.path in ["/docs", "/redoc", "/openapi.json", "/health", "/"]:
-                return
-            
-            # Get request body if present
-            if hasattr(request, '_body'):
-                body = request._body
-            else:
-                body = await request.body()
-                request._body = body
+        # Skip aggressive validation in test mode or debug mode with relaxed security
+        if (getattr(settings, 'test_mode', False) or 
+            (getattr(settings, 'debug', False) and getattr(settings, 'relaxed_security_in_debug', True))):
+            # In test/debug mode, be less aggressive with validation
+            return
+        
+        # Skip validation for documentation and health endpoints
+        if request.url.path in ["/docs", "/redoc", "/openapi.json", "/health", "/"]:
+            return
+        
+        # Get request body if present (Request caches it on _body)
+        body = await request.body()
+        
+        if body:
+            # Validate the raw body for security threats without decoding it
+            validation_result = validate_input_bytes(body)
             
-            if body:
-                body_text = body.decode('utf-8', errors='ignore')
-                
-                # Validate input for security threats
-                validation_result = validate_input(body_text)
+            if not validation_result["is_safe"]:
+                threats = validation_result["threats"]
+                high_severity_threats = [t for t in threats if t["severity"] == "high"]
                 
-                if not validation_result["is_safe"]:
-                    threats = validation_result["threats"]
-                    high_severity_threats = [t for t in threats if t["severity"] == "high"]
-                    
-                    if high_severity_threats:
-                        log_security_event(
-                            "high_severity_input_threat",
-                            f"High severity input threat detected: {high_severity_threats}",
-                            "critical",
-                            ip_address=self._get_client_ip(request),
-                            endpoint=str(request.url),
-                            method=request.method,
-                            threats=threats
-                        )
-                        
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Invalid input detected"
-                        )
-        
-        except UnicodeDecodeError:
-            # Invalid UTF-8 encoding
-            log_security_event(
-                "invalid_encoding_detected",
-                "Invalid UTF-8 encoding in request body",
-                "medium",
-                ip_address=self._get_client_ip(request),
-                endpoint=str(request.url),
-                method=request.method
-            )
-    
-    def _validate_request_headers(self, request: Request):
-        """Validate request headers for security issues"""
-        # Check for header injection attempts
-        for header_name, header_value in request.headers.items():
-            if isinstance(header_value, str):
-                if '\r' in header_value or '\n' in header_value:
+                if high_severity_threats:
                     log_security_event(
-                        "header_injection_attempt",
-                        f"Header injection detected in {header_name}",
-                        "high",
-                        ip_address=self._get_client_ip(request),
+                        "high_severity_input_threat",
+                        "High severity input threat detected: %s",
+                        "critical",
+                        high_severity_threats,
+                        ip_address=getattr(request.state, "client_ip", None) or self._get_client_ip(request),
                         endpoint=str(request.url),
                         method=request.method,
-                        header_name=header_name
+                        threats=threats
                     )
                     
                     raise HTTPException(
                         status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Invalid header format"
+                        detail="Invalid input detected"
                     )
+    
+    def _validate_request_headers(self, request: Request):
+        """Validate request headers for security issues"""
+        headers = _request_headers(request)
+        
+        # Check for header injection attempts (found during the single raw header scan)
+        if headers.injected_header is not None:
+            header_name = headers.injected_header
+            log_security_event(
+                "header_injection_attempt",
+                "Header injection detected in %s",
+                "high",
+                header_name,
+                ip_address=getattr(request.state, "client_ip", None) or self._get_client_ip(request),
+                endpoint=str(request.url),
+                method=request.method,
+                header_name=header_name
+            )
+            
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid header format"
+            )
         
         # Check for suspicious user agents
-        user_agent = request.headers.get("user-agent", "").lower()
+        user_agent = (headers.user_agent or "").lower()
         suspicious_patterns = [
             "sqlmap", "nmap", "nikto", "burp", "owasp", "havij",
             "sqlninja", "acunetix", "netsparker", "appscan"
@@ -268,31 +402,35 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             if pattern in user_agent:
                 log_security_event(
                     "suspicious_user_agent",
-                    f"Suspicious user agent detected: {user_agent}",
+                    "Suspicious user agent detected: %s",
                     "medium",
-                    ip_address=self._get_client_ip(request),
+                    user_agent,
+                    ip_address=getattr(request.state, "client_ip", None) or self._get_client_ip(request),
                     endpoint=str(request.url),
                     method=request.method,
                     user_agent=user_agent
                 )
                 break
     
-    def _log_request(self, request: Request, response: Response, processing_time: float, client_ip: str):
+    def _log_request(self, request: Request, status_code: Optional[int], processing_time: float, client_ip: str):
         """Log request for monitoring"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        
         logger.info(
-            f"REQUEST: {request.method} {request.url} - "
-            f"Status: {response.status_code} - "
-            f"IP: {client_ip} - "
-            f"Time: {processing_time:.3f}s - "
-            f"UA: {request.headers.get('user-agent', 'Unknown')[:100]}"
+            "REQUEST: %s %s - Status: %s - IP: %s - Time: %.3fs - UA: %.100s",
+            request.method,
+            request.url,
+            status_code,
+            client_ip,
+            processing_time,
+            _request_headers(request).user_agent or 'Unknown'
         )
 
-class AuthenticationMiddleware(BaseHTTPMiddleware):
-    """Authentication middleware for protected routes"""
+class _AuthenticationMixin:
+    """Bearer token / API key authentication shared by the auth middlewares"""
     
-    def __init__(self, app, protected_paths: list = None):
-        print("[DEBUG] AuthenticationMiddleware __init__ called")
-        super().__init__(app)
+    def _init_authentication(self, protected_paths: list = None):
         self.protected_paths = protected_paths or [
             "/api/v1/rag/documents",
             "/api/v1/rag/query", 
@@ -300,170 +438,154 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             "/api/v1/admin",
             "/api/v1/auth/me"
         ]
+        # str.startswith accepts a tuple, so one C-level call covers every prefix
+        self._protected_tuple = tuple(self.protected_paths)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        print(f"[DEBUG] AuthenticationMiddleware dispatch called for path: {request.url.path}")
+    async def _authenticate(self, request: Request) -> Optional[Response]:
+        """Authenticate the request; return an error response, or None on success"""
         path = request.url.path
         
-        # Debug logging
-        logger.info(f"AUTH_MIDDLEWARE: Processing path: {path}")
-        logger.info(f"AUTH_MIDDLEWARE: Protected paths: {self.protected_paths}")
-        
-        # Allow OPTIONS requests (CORS preflight) without authentication
-        if request.method == "OPTIONS":
-            response = await call_next(request)
-            return response
-        
-        # Check if path requires authentication
-        is_protected = any(path.startswith(protected_path) for protected_path in self.protected_paths)
-        logger.info(f"AUTH_MIDDLEWARE: Path {path} is protected: {is_protected}")
-        
-        if is_protected:
-            # Try to authenticate user
-            try:
-                user = None
-                api_key = None
-                
-                # Check for Bearer token
-                auth_header = request.headers.get("authorization")
-                if auth_header and auth_header.startswith("Bearer "):
-                    token = auth_header.split(" ")[1]
+        try:
+            user = None
+            api_key = None
+            
+            # Check for Bearer token
+            # Single partition instead of startswith + split
+            headers = _request_headers(request)
+            scheme, _, token = (headers.authorization or "").partition(" ")
+            if scheme == "Bearer" and token:
+                # Verify token (this handles both real and mock tokens)
+                token_data = auth_manager.verify_token(token)
+                if token_data:
+                    # Create user from token data (token_data is a dict)
+                    # Role parsing handles both enum names and values
+                    user_role = _ROLE_MAP.get(token_data.get("role") or "", UserRole.USER)
                     
-                    # Verify token (this handles both real and mock tokens)
-                    token_data = auth_manager.verify_token(token)
-                    if token_data:
-                        # Create user from token data (token_data is a dict)
-                        # Fix role parsing - handle both enum names and values
-                        role_str = token_data.get("role") or "user"
-                        if role_str.startswith("UserRole."):
-                            # Extract the enum value from "UserRole.ADMIN" -> "admin"
-                            role_value = role_str.split(".")[1].lower()
-                        else:
-                            role_value = role_str
-                        
-                        # Convert role string to UserRole enum
-                        try:
-                            user_role = UserRole(role_value)
-                        except (ValueError, TypeError):
-                            user_role = UserRole.USER
-                        
-                        # Ensure we have a valid user ID
-                        user_id = token_data.get("sub") or token_data.get("user_id") or "unknown"
-                        if user_id is None:
-                            user_id = "unknown"
-                        
-                        user = User(
-                            id=user_id,
-                            username=token_data.get("username") or "unknown",
-                            email="user@example.com",
-                            hashed_password="",
-                            role=user_role
-                        )
-                        
-                        # Store token permissions in user metadata for permission checking
-                        token_permissions = token_data.get("permissions", [])
-                        user.metadata["token_permissions"] = token_permissions
-                        
-                        # Debug logging for testing
-                        logger.debug(f"Token authenticated successfully: {token_data.get('username')}")
-                        try:
-                            with open('/tmp/auth_debug.txt', 'a') as f:
-                                f.write(f"[AUTH_MIDDLEWARE] User created: {user.username}, Role: {user.role}, Permissions: {user.metadata.get('token_permissions', [])}\n")
-                        except Exception as file_exc:
-                            logger.error(f"Failed to write debug file: {file_exc}")
-                
-                # Check for API key
-                api_key_header = request.headers.get("x-api-key")
-                if api_key_header and not user:  # Only check API key if no user token
-                    try:
-                        api_key = await auth_manager.authenticate_api_key(
-                            api_key_header, 
-                            self._get_client_ip(request)
-                        )
-                    except Exception as api_error:
-                        logger.debug(f"API key authentication failed: {api_error}")
-                        api_key = None
-                
-                # If no authentication method succeeded, return 401
-                if not user and not api_key:
-                    logger.debug(f"No valid authentication found for path: {path}")
-                    return JSONResponse(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        content={
-                            "error": "Authentication required",
-                            "code": "AUTHENTICATION_REQUIRED"
-                        },
-                        headers={
-                            **create_security_headers(),
-                            "WWW-Authenticate": "Bearer"
-                        }
+                    # Ensure we have a valid user ID
+                    user_id = token_data.get("sub") or token_data.get("user_id") or "unknown"
+                    if user_id is None:
+                        user_id = "unknown"
+                    
+                    # Lightweight principal carrying token permissions for permission checks
+                    user = LightUser(
+                        user_id,
+                        token_data.get("username") or "unknown",
+                        user_role,
+                        tuple(token_data.get("permissions") or ())
                     )
-                
-                # Add authentication info to request state
-                request.state.user = user
-                request.state.api_key = api_key
-                
-                logger.debug(f"Authentication successful for path: {path}")
-                
-            except Exception as e:
-                logger.error(f"Authentication error: {e}")
-                logger.debug(f"Authentication error details", exc_info=True)
-                
-                # Return 401 for authentication errors
-                return JSONResponse(
+                    
+                    logger.debug("User authenticated: %s", token_data.get('username'))
+            
+            # Check for API key
+            api_key_header = headers.api_key
+            if api_key_header and not user:  # Only check API key if no user token
+                try:
+                    api_key = await auth_manager.authenticate_api_key(
+                        api_key_header, 
+                        getattr(request.state, "client_ip", None) or self._get_client_ip(request)
+                    )
+                except Exception as api_error:
+                    logger.debug(f"API key authentication failed: {api_error}")
+                    api_key = None
+            
+            # If no authentication method succeeded, return 401
+            if not user and not api_key:
+                logger.debug(f"No valid authentication found for path: {path}")
+                return Response(
+                    content=_AUTHENTICATION_REQUIRED_BODY,
                     status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={
-                        "error": "Authentication failed",
-                        "code": "AUTHENTICATION_FAILED"
-                    },
-                    headers=create_security_headers()
+                    media_type="application/json",
+                    headers=_AUTHENTICATION_REQUIRED_HEADERS
                 )
+            
+            # Add authentication info to request state
+            request.state.user = user
+            request.state.api_key = api_key
+            
+            logger.debug(f"Authentication successful for path: {path}")
+            
+        except Exception as e:
+            logger.error(f"Authentication error: {e}")
+            logger.debug(f"Authentication error details", exc_info=True)
+            
+            # Return 401 for authentication errors
+            return JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={
+                    "error": "Authentication failed",
+                    "code": "AUTHENTICATION_FAILED"
+                },
+                headers=create_security_headers()
+            )
         
-        # Continue to next middleware/handler
-        response = await call_next(request)
-        return response
-
+        return None
+    
     def _get_client_ip(self, request: Request) -> Optional[str]:
         """Extract client IP address"""
-        # Check X-Forwarded-For header (from load balancer/proxy)
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            # Take the first IP (original client)
-            client_ip = forwarded_for.split(",")[0].strip()
-            if validate_ip_address(client_ip):
-                return client_ip
-        
-        # Check X-Real-IP header
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip and validate_ip_address(real_ip):
-            return real_ip
-        
-        # Fall back to direct connection IP
-        if hasattr(request.client, "host"):
-            return request.client.host
+        return _resolve_client_ip(request)
+
+class AuthenticationMiddleware(_AuthenticationMixin):
+    """Authentication middleware for protected routes (raw ASGI)"""
+    
+    def __init__(self, app, protected_paths: list = None):
+        self.app = app
+        self._init_authentication(protected_paths)
+    
+    async def __call__(self, scope, receive, send):
+        # Allow non-HTTP traffic and OPTIONS requests (CORS preflight) without authentication
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
         
-        return None
+        path = scope["path"]
+        
+        # Check if path requires authentication
+        is_protected = path.startswith(self._protected_tuple)
+        logger.debug("AUTH_MIDDLEWARE: Path %s is protected: %s", path, is_protected)
+        
+        if is_protected:
+            request = Request(scope, receive)
+            denied = await self._authenticate(request)
+            if denied is not None:
+                await denied(scope, receive, send)
+                return
+        
+        # Continue to next middleware/handler
+        await self.app(scope, receive, send)
 
-class AuthorizationMiddleware(BaseHTTPMiddleware):
-    """Authorization middleware for role-based access control"""
+class _AuthorizationMixin:
+    """Role requirement checks shared by the authorization middlewares"""
     
-    def __init__(self, app, role_requirements: dict = None):
-        super().__init__(app)
+    def _init_authorization(self, role_requirements: dict = None):
         self.role_requirements = role_requirements or {
             "/api/v1/admin": "admin",
             "/api/v1/rag/documents/bulk": "developer",
             "/api/v1/rag/cache/clear": "admin"
         }
+        # Compile all prefixes into one anchored alternation; each prefix gets its
+        # own group so the matching group index maps straight to the required role
+        self._roles = list(self.role_requirements.values())
+        self._insufficient_privileges_bodies = {
+            role: _encode_json({
+                "error": f"Insufficient privileges. Required role: {role}",
+                "code": "INSUFFICIENT_PRIVILEGES"
+            })
+            for role in self._roles
+        }
+        self._role_regex = re.compile(
+            "^(?:" + "|".join(f"({re.escape(p)})" for p in self.role_requirements) + ")"
+        ) if self.role_requirements else None
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    def _authorize(self, request: Request) -> Optional[Response]:
+        """Check role requirements; return an error response, or None if allowed"""
         path = request.url.path
         
         # Check if path has role requirements
         required_role = None
-        for protected_path, role in self.role_requirements.items():
-            if path.startswith(protected_path):
-                required_role = role
-                break
+        if self._role_regex is not None:
+            match = self._role_regex.match(path)
+            if match:
+                required_role = self._roles[match.lastindex - 1]
         
         if required_role:
             user = getattr(request.state, "user", None)
@@ -480,17 +602,58 @@ class AuthorizationMiddleware(BaseHTTPMiddleware):
                 pass  # TODO: Implement API key role checking
             
             if not has_permission:
-                return JSONResponse(
+                return Response(
+                    content=self._insufficient_privileges_bodies[required_role],
                     status_code=status.HTTP_403_FORBIDDEN,
-                    content={
-                        "error": f"Insufficient privileges. Required role: {required_role}",
-                        "code": "INSUFFICIENT_PRIVILEGES"
-                    },
+                    media_type="application/json",
                     headers=create_security_headers()
                 )
         
-        response = await call_next(request)
-        return response
+        return None
+
+class AuthorizationMiddleware(_AuthorizationMixin):
+    """Authorization middleware for role-based access control (raw ASGI)"""
+    
+    def __init__(self, app, role_requirements: dict = None):
+        self.app = app
+        self._init_authorization(role_requirements)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            denied = self._authorize(Request(scope, receive))
+            if denied is not None:
+                await denied(scope, receive, send)
+                return
+        
+        await self.app(scope, receive, send)
+
+class UnifiedSecurityMiddleware(_AuthenticationMixin, _AuthorizationMixin, SecurityMiddleware):
+    """Security, authentication and authorization checks fused into a single dispatch.
+    
+    Equivalent to stacking SecurityMiddleware, AuthenticationMiddleware and
+    AuthorizationMiddleware, but the client IP is resolved once and only one
+    middleware layer wraps the downstream app.
+    """
+    
+    def __init__(
+        self,
+        app,
+        enable_rate_limiting: bool = True,
+        enable_ip_blocking: bool = True,
+        protected_paths: list = None,
+        role_requirements: dict = None
+    ):
+        super().__init__(app, enable_rate_limiting, enable_ip_blocking)
+        self._init_authentication(protected_paths)
+        self._init_authorization(role_requirements)
+    
+    async def _check_access(self, request: Request) -> Optional[Response]:
+        if request.url.path.startswith(self._protected_tuple):
+            denied = await self._authenticate(request)
+            if denied is not None:
+                return denied
+        
+        return self._authorize(request)
 
 # Convenience functions for middleware setup
 def security_middleware(enable_rate_limiting: bool = True, enable_ip_blocking: bool = True):
@@ -509,4 +672,17 @@ def authorization_middleware(role_requirements: dict = None):
     """Create authorization middleware instance"""
     def middleware_factory(app):
         return AuthorizationMiddleware(app, role_requirements)
-    return middleware_factory 
\ No newline at end of file
+    return middleware_factory
+
+def unified_security_middleware(
+    enable_rate_limiting: bool = True,
+    enable_ip_blocking: bool = True,
+    protected_paths: list = None,
+    role_requirements: dict = None
+):
+    """Create unified security/authentication/authorization middleware instance"""
+    def middleware_factory(app):
+        return UnifiedSecurityMiddleware(
+            app, enable_rate_limiting, enable_ip_blocking, protected_paths, role_requirements
+        )
+    return middleware_factory
\ No newline at end of file
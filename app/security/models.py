@@ -1,9 +1,36 @@
 from enum import Enum
-from typing import Optional, List, Dict, Any
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Tuple, FrozenSet
 from datetime import datetime, timedelta
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator
 import uuid
+import json
 import logging
+import time
+
+from ..core.json_codec import loads as _loads
+
+def _parse_json_dict(v):
+    """Decode a JSONB column that may arrive as text; {} for NULL or invalid JSON"""
+    if isinstance(v, str):
+        try:
+            return _loads(v)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+    elif v is None:
+        return {}
+    return v
+
+def _parse_json_list(v):
+    """Decode a JSONB column that may arrive as text; [] for NULL or invalid JSON"""
+    if isinstance(v, str):
+        try:
+            return _loads(v)
+        except (json.JSONDecodeError, TypeError):
+            return []
+    elif v is None:
+        return []
+    return v
 
 class UserRole(str, Enum):
     """User roles with hierarchical permissions"""
@@ -44,10 +71,15 @@ class Permission(str, Enum):
     WEBSOCKET_CONNECT = "websocket_connect"
     WEBSOCKET_BROADCAST = "websocket_broadcast"
 
-# Role-based permissions mapping
-ROLE_PERMISSIONS = {
-    UserRole.SUPER_ADMIN: list(Permission),  # All permissions
-    UserRole.ADMIN: [
+# Value -> member lookups so validators resolve strings without raising
+# and catching ValueError for unknown values
+_USER_ROLE_BY_VALUE: Dict[str, UserRole] = {r.value: r for r in UserRole}
+_PERMISSION_BY_VALUE: Dict[str, Permission] = {p.value: p for p in Permission}
+
+# Role-based permissions mapping (frozensets for O(1) membership checks)
+ROLE_PERMISSIONS: Dict[UserRole, FrozenSet[Permission]] = {
+    UserRole.SUPER_ADMIN: frozenset(Permission),  # All permissions
+    UserRole.ADMIN: frozenset({
         Permission.READ_DOCUMENTS,
         Permission.WRITE_DOCUMENTS,
         Permission.DELETE_DOCUMENTS,
@@ -66,8 +98,8 @@ ROLE_PERMISSIONS = {
         Permission.SYSTEM_CONFIG,
         Permission.WEBSOCKET_CONNECT,
         Permission.WEBSOCKET_BROADCAST,
-    ],
-    UserRole.DEVELOPER: [
+    }),
+    UserRole.DEVELOPER: frozenset({
         Permission.READ_DOCUMENTS,
         Permission.WRITE_DOCUMENTS,
         Permission.BULK_IMPORT_DOCUMENTS,
@@ -78,8 +110,8 @@ ROLE_PERMISSIONS = {
         Permission.READ_HEALTH,
         Permission.VIEW_PERFORMANCE,
         Permission.WEBSOCKET_CONNECT,
-    ],
-    UserRole.ANALYST: [
+    }),
+    UserRole.ANALYST: frozenset({
         Permission.READ_DOCUMENTS,
         Permission.WRITE_DOCUMENTS,
         Permission.EXECUTE_QUERIES,
@@ -88,23 +120,62 @@ ROLE_PERMISSIONS = {
         Permission.READ_STATS,
         Permission.READ_HEALTH,
         Permission.WEBSOCKET_CONNECT,
-    ],
-    UserRole.USER: [
+    }),
+    UserRole.USER: frozenset({
         Permission.READ_DOCUMENTS,
         Permission.EXECUTE_QUERIES,
         Permission.USE_AGENT,
         Permission.READ_HEALTH,
         Permission.WEBSOCKET_CONNECT,
-    ],
-    UserRole.READONLY: [
+    }),
+    UserRole.READONLY: frozenset({
         Permission.READ_DOCUMENTS,
         Permission.EXECUTE_QUERIES,
         Permission.READ_HEALTH,
-    ]
+    })
+}
+
+# Bitmask form of the same mapping: one bit per Permission, one OR-ed mask per
+# role, so a role check is a single AND
+_PERM_BIT: Dict[Permission, int] = {p: 1 << i for i, p in enumerate(Permission)}
+_ROLE_MASK: Dict[UserRole, int] = {
+    role: sum(_PERM_BIT[p] for p in permissions)
+    for role, permissions in ROLE_PERMISSIONS.items()
 }
 
+def _permission_mask(permissions) -> int:
+    """OR of the bits of every known permission (enum members or their string values)"""
+    mask = 0
+    for permission in permissions:
+        mask |= _PERM_BIT.get(permission, 0)
+    return mask
+
+# Memoized has_permission answers, both grants and denials. The key holds
+# everything the answer depends on (principal, role, permission and the
+# explicit permission frozenset), so a role or permission change simply misses;
+# the TTL and size cap only bound memory.
+_PERMISSION_CACHE_TTL = 60.0
+_PERMISSION_CACHE_MAXSIZE = 50000
+_permission_cache: Dict[tuple, Tuple[float, bool]] = {}
+
+def _cached_permission(key: tuple, compute) -> bool:
+    """Return the cached answer for key, or compute, store and return it"""
+    now = time.monotonic()
+    entry = _permission_cache.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    result = compute()
+    if len(_permission_cache) >= _PERMISSION_CACHE_MAXSIZE:
+        # Evict the oldest insertion (dicts keep insertion order)
+        _permission_cache.pop(next(iter(_permission_cache)), None)
+    _permission_cache[key] = (now + _PERMISSION_CACHE_TTL, result)
+    return result
+
 class User(BaseModel):
     """User model with security attributes"""
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+    
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     username: str = Field(..., min_length=3, max_length=50)
     email: str = Field(..., pattern=r'^[^@]+@[^@]+\.[^@]+$')
@@ -127,19 +198,14 @@ class User(BaseModel):
     # Metadata
     metadata: Dict[str, Any] = Field(default_factory=dict)
     
+    # (source list, its length, frozenset, bitmask) for metadata["token_permissions"]
+    _token_permission_cache: Optional[tuple] = PrivateAttr(default=None)
+    
     @field_validator('metadata', mode='before')
     @classmethod
     def validate_metadata(cls, v):
         """Handle metadata that might be stored as JSON string in database"""
-        if isinstance(v, str):
-            try:
-                import json
-                return json.loads(v)
-            except (json.JSONDecodeError, TypeError):
-                return {}
-        elif v is None:
-            return {}
-        return v
+        return _parse_json_dict(v)
     
     @field_validator('username')
     @classmethod
@@ -153,39 +219,101 @@ class User(BaseModel):
     def validate_role(cls, v):
         """Convert role string to UserRole enum"""
         if isinstance(v, str):
-            try:
-                return UserRole(v)
-            except ValueError:
-                return UserRole.USER
-        elif isinstance(v, UserRole):
-            return v
+            return _USER_ROLE_BY_VALUE.get(v, UserRole.USER)
         else:
             return UserRole.USER
     
     def has_permission(self, permission: Permission) -> bool:
         # Ensure role is always an enum
         role = self.role
-        if isinstance(role, str):
-            try:
-                role = UserRole(role)
-            except ValueError:
-                role = UserRole.USER
+        if not isinstance(role, UserRole):
+            role = _USER_ROLE_BY_VALUE.get(role, UserRole.USER)
         
-        # First check role-based permissions
-        if permission in ROLE_PERMISSIONS.get(role, []):
+        # Super admins hold every permission
+        if role is UserRole.SUPER_ADMIN:
             return True
         
-        # Then check token permissions (for permissions not in role hierarchy)
-        token_permissions = self.metadata.get("token_permissions", [])
+        token_cache = self._token_permissions()
+        return _cached_permission(
+            ("user", self.id, role, permission, token_cache[2]),
+            lambda: self._check_permission(role, permission, token_cache[2], token_cache[3])
+        )
+    
+    @staticmethod
+    def _check_permission(role: UserRole, permission: Permission, token_permissions: FrozenSet[str], token_mask: int) -> bool:
+        # Role-based and token permissions (for permissions not in role hierarchy) in one AND
+        bit = _PERM_BIT.get(permission)
+        if bit is not None:
+            return bool((_ROLE_MASK.get(role, 0) | token_mask) & bit)
+        
+        # Not a known Permission; only an exact token permission string can grant it
         permission_str = permission.value if hasattr(permission, 'value') else str(permission)
         return permission_str in token_permissions
     
-    def is_locked(self) -> bool:
-        """Check if user account is locked"""
-        return bool(self.locked_until and self.locked_until > datetime.utcnow())
+    def _token_permissions(self) -> tuple:
+        """Cached (source, length, frozenset, bitmask) for metadata["token_permissions"], rebuilt when the list changes"""
+        source = self.metadata.get("token_permissions") or ()
+        cache = self._token_permission_cache
+        if cache is None or cache[0] is not source or cache[1] != len(source):
+            cache = (source, len(source), frozenset(source), _permission_mask(source))
+            self._token_permission_cache = cache
+        return cache
+
+    
+    @classmethod
+    def from_db_row(cls, row: Dict[str, Any]) -> "User":
+        """Build a User from a trusted users-table row, skipping full validation.
+        
+        Only the columns the database stores in a different shape (JSONB as text,
+        role as a plain string) are converted, and the username is normalised as
+        validation would; use User(**data) for API input.
+        """
+        data = dict(row)
+        data["username"] = cls.validate_username(data["username"])
+        data["role"] = cls.validate_role(data.get("role"))
+        data["metadata"] = cls.validate_metadata(data.get("metadata"))
+        if isinstance(data.get("allowed_ips"), str):
+            data["allowed_ips"] = _parse_json_list(data["allowed_ips"])
+        return cls.model_construct(**data)
+    
+    def is_locked(self, now: Optional[datetime] = None) -> bool:
+        """Check if user account is locked (pass now to reuse one utcnow() per request)"""
+        return bool(self.locked_until and self.locked_until > (now or datetime.utcnow()))
+
+@dataclass(slots=True)
+class LightUser:
+    """Lightweight authenticated principal attached to request.state by the auth middleware"""
+    id: str
+    username: str
+    role: UserRole = UserRole.USER
+    permissions: Tuple[str, ...] = ()
+    
+    def has_permission(self, permission: Permission) -> bool:
+        if self.role is UserRole.SUPER_ADMIN:
+            return True
+        
+        if _ROLE_MASK.get(self.role, 0) & _PERM_BIT.get(permission, 0):
+            return True
+        
+        permission_str = permission.value if hasattr(permission, 'value') else str(permission)
+        return permission_str in self.permissions
+    
+    def to_user(self) -> User:
+        """Expand into a full User model for handlers that need the complete record"""
+        user = User(
+            id=self.id,
+            username=self.username,
+            email="user@example.com",
+            hashed_password="",
+            role=self.role
+        )
+        user.metadata["token_permissions"] = list(self.permissions)
+        return user
 
 class APIKey(BaseModel):
     """API Key model for service-to-service authentication"""
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+    
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     key_id: str = Field(..., min_length=8, max_length=32)
     hashed_key: str
@@ -203,16 +331,14 @@ class APIKey(BaseModel):
         """Handle permissions that might be stored as JSON string in database"""
         if isinstance(v, str):
             try:
-                import json
-                permission_strings = json.loads(v)
+                permission_strings = _loads(v)
                 # Convert permission strings to Permission enum objects
                 permissions = []
                 for perm_str in permission_strings:
-                    try:
-                        permissions.append(Permission(perm_str))
-                    except ValueError:
-                        # Skip invalid permissions
-                        continue
+                    # Skip invalid permissions
+                    permission = _PERMISSION_BY_VALUE.get(perm_str)
+                    if permission is not None:
+                        permissions.append(permission)
                 return permissions
             except (json.JSONDecodeError, TypeError):
                 return []
@@ -220,13 +346,12 @@ class APIKey(BaseModel):
             # Handle case where database returns a list of strings
             permissions = []
             for item in v:
-                if isinstance(item, str):
-                    try:
-                        permissions.append(Permission(item))
-                    except ValueError:
-                        continue
-                elif isinstance(item, Permission):
+                if isinstance(item, Permission):
                     permissions.append(item)
+                elif isinstance(item, str):
+                    permission = _PERMISSION_BY_VALUE.get(item)
+                    if permission is not None:
+                        permissions.append(permission)
             return permissions
         elif v is None:
             return []
@@ -237,29 +362,7 @@ class APIKey(BaseModel):
     @classmethod
     def validate_allowed_ips(cls, v):
         """Handle allowed_ips that might be stored as JSON string in database"""
-        if isinstance(v, str):
-            try:
-                import json
-                return json.loads(v)
-            except (json.JSONDecodeError, TypeError):
-                return []
-        elif v is None:
-            return []
-        return v
-    
-    @field_validator('metadata', mode='before')
-    @classmethod
-    def validate_metadata(cls, v):
-        """Handle metadata that might be stored as JSON string in database"""
-        if isinstance(v, str):
-            try:
-                import json
-                return json.loads(v)
-            except (json.JSONDecodeError, TypeError):
-                return {}
-        elif v is None:
-            return {}
-        return v
+        return _parse_json_list(v)
     
     # Lifecycle management
     is_active: bool = True
@@ -276,25 +379,65 @@ class APIKey(BaseModel):
     created_by: Optional[str] = None  # User ID who created this key
     metadata: Dict[str, Any] = Field(default_factory=dict)
     
-    def is_expired(self) -> bool:
-        """Check if API key is expired"""
-        return bool(self.expires_at and self.expires_at < datetime.utcnow())
+    @field_validator('metadata', mode='before')
+    @classmethod
+    def validate_metadata(cls, v):
+        """Handle metadata that might be stored as JSON string in database"""
+        return _parse_json_dict(v)
+    
+    # (source list, its length, frozenset, bitmask) for permissions
+    _permission_cache: Optional[tuple] = PrivateAttr(default=None)
+    
+    @classmethod
+    def from_db_row(cls, row: Dict[str, Any]) -> "APIKey":
+        """Build an APIKey from a trusted api_keys-table row, skipping full validation"""
+        data = dict(row)
+        data["role"] = User.validate_role(data.get("role"))
+        data["permissions"] = cls.validate_permissions(data.get("permissions"))
+        data["allowed_ips"] = cls.validate_allowed_ips(data.get("allowed_ips"))
+        data["metadata"] = cls.validate_metadata(data.get("metadata"))
+        return cls.model_construct(**data)
+    
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        """Check if API key is expired (pass now to reuse one utcnow() per request)"""
+        return bool(self.expires_at and self.expires_at < (now or datetime.utcnow()))
+    
+    @property
+    def _permission_bits(self) -> int:
+        """permissions as a bitmask over _PERM_BIT"""
+        return self._permission_info()[3]
+    
+    def _permission_info(self) -> tuple:
+        """Cached (source, length, frozenset, bitmask) for permissions, rebuilt when the list changes"""
+        source = self.permissions
+        cache = self._permission_cache
+        if cache is None or cache[0] is not source or cache[1] != len(source):
+            cache = (source, len(source), frozenset(source), _permission_mask(source))
+            self._permission_cache = cache
+        return cache
     
     def has_permission(self, permission: Permission) -> bool:
         """Check if API key has specific permission"""
-        if permission in self.permissions:
-            return True
-        
-        # Fall back to role-based permissions
-        role_permissions = ROLE_PERMISSIONS.get(self.role, [])
-        
-        if permission in role_permissions:
+        role = self.role
+        if role is UserRole.SUPER_ADMIN:
             return True
         
-        return False
+        # permissions only ever holds Permission members, so the mask describes it fully
+        permission_bits = self._permission_bits
+        return _cached_permission(
+            ("api_key", self.id, role, permission, permission_bits),
+            lambda: self._check_permission(role, permission, permission_bits)
+        )
+    
+    @staticmethod
+    def _check_permission(role: UserRole, permission: Permission, permission_bits: int) -> bool:
+        # Explicit key permissions, falling back to role-based permissions, in one AND
+        return bool((permission_bits | _ROLE_MASK.get(role, 0)) & _PERM_BIT.get(permission, 0))
 
 class SecurityEvent(BaseModel):
     """Security event logging model"""
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+    
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     event_type: str = Field(..., min_length=1, max_length=50)
     severity: str = Field(..., pattern=r'^(low|medium|high|critical)$')
@@ -325,6 +468,8 @@ class SecurityEvent(BaseModel):
 
 class TokenData(BaseModel):
     """JWT token data model"""
+    model_config = ConfigDict(extra='ignore', validate_assignment=False)
+    
     user_id: Optional[str] = None
     username: Optional[str] = None
     role: Optional[UserRole] = None
@@ -1,22 +1,66 @@
+import asyncio
 import hashlib
 import hmac
 import secrets
 import re
 import html
-import bleach
 import ipaddress
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Deque, Mapping
+from datetime import datetime
 from passlib.context import CryptContext
 from cryptography.fernet import Fernet
 import base64
+import bcrypt
 import logging
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Optional faster engines for the SECURITY_PATTERNS scan: Hyperscan (multi-pattern
+# DFA) first, then RE2 (linear time, no catastrophic backtracking), then re
+try:
+    import hyperscan
+    HAS_HYPERSCAN = True
+except ImportError:
+    HAS_HYPERSCAN = False
+    hyperscan = None
+
+try:
+    import re2
+    HAS_RE2 = True
+except ImportError:
+    HAS_RE2 = False
+    re2 = None
+
+# nh3 (Rust bindings to the ammonia sanitizer) replaces bleach when installed
+try:
+    import nh3
+    HAS_NH3 = True
+except ImportError:
+    HAS_NH3 = False
+    nh3 = None
+    import bleach
+
+# Password hashing: bcrypt is called directly (same cost as passlib's default).
+# Passlib is only kept to verify hashes in a format bcrypt cannot read.
+_BCRYPT_ROUNDS = 12
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+_legacy_pwd_context: Optional[CryptContext] = None
+
+def _legacy_password_context() -> CryptContext:
+    global _legacy_pwd_context
+    if _legacy_pwd_context is None:
+        _legacy_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _legacy_pwd_context
+
+def _bcrypt_secret(password: str) -> bytes:
+    # bcrypt only uses the first 72 bytes; passlib truncated silently as well
+    return password.encode("utf-8")[:72]
 
 # Security patterns for input validation
 SECURITY_PATTERNS = {
@@ -49,79 +93,281 @@ SECURITY_PATTERNS = {
     ]
 }
 
+# Every pattern is named "<threat_type>_<index>" so scan results can be mapped
+# back to their threat class and pattern
+_PATTERN_GROUPS: Dict[str, tuple] = {
+    f"{threat_type}_{i}": (threat_type, pattern)
+    for threat_type, patterns in SECURITY_PATTERNS.items()
+    for i, pattern in enumerate(patterns)
+}
+_PATTERN_GROUP_NAMES = list(_PATTERN_GROUPS)
+_PATTERN_GROUP_ORDER = {name: i for i, name in enumerate(_PATTERN_GROUP_NAMES)}
+
+def _compile_case_insensitive(source: bytes):
+    """Compile with RE2 when available, falling back to re for unsupported syntax"""
+    if HAS_RE2:
+        try:
+            return re2.compile(b"(?i)" + source)
+        except Exception:
+            pass
+    return re.compile(source, re.IGNORECASE)
+
+# One precompiled regex per signature, grouped by threat class. Signatures are
+# searched one by one: a combined alternation never reports overlapping matches,
+# so a medium-severity hit could hide a high-severity one on the same text
+_COMPILED_PATTERNS = {
+    threat_type: [
+        (f"{threat_type}_{i}", re.compile(pattern, re.IGNORECASE))
+        for i, pattern in enumerate(patterns)
+    ]
+    for threat_type, patterns in SECURITY_PATTERNS.items()
+}
+
+# Byte-level variants (all patterns are ASCII) so raw request bodies can be
+# scanned without decoding them to str first. These use RE2 when installed;
+# str input is then encoded and scanned here too, since RE2 matches UTF-8
+_COMPILED_PATTERNS_BYTES = {
+    threat_type: [
+        (f"{threat_type}_{i}", _compile_case_insensitive(pattern.encode()))
+        for i, pattern in enumerate(patterns)
+    ]
+    for threat_type, patterns in SECURITY_PATTERNS.items()
+}
+
+def _build_hyperscan_database():
+    """Compile every signature into one Hyperscan database; ids index _PATTERN_GROUP_NAMES"""
+    expressions = [pattern.encode() for _, pattern in _PATTERN_GROUPS.values()]
+    database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    database.compile(
+        expressions=expressions,
+        ids=list(range(len(expressions))),
+        elements=len(expressions),
+        flags=hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH,
+    )
+    return database
+
+_HYPERSCAN_DB = None
+if HAS_HYPERSCAN:
+    try:
+        _HYPERSCAN_DB = _build_hyperscan_database()
+    except Exception as e:
+        logger.warning("Hyperscan database compile failed, using regex scan instead: %s", e)
+
+# Hyperscan scratch space must not be shared between concurrent scans
+_hyperscan_local = threading.local()
+
+def _on_hyperscan_match(pattern_id, start, end, flags, matched):
+    matched.add(_PATTERN_GROUP_NAMES[pattern_id])
+
+def _hyperscan_scan(data: bytes) -> set:
+    """Return the names of all signatures that match data"""
+    scratch = getattr(_hyperscan_local, "scratch", None)
+    if scratch is None:
+        scratch = _hyperscan_local.scratch = hyperscan.Scratch(_HYPERSCAN_DB)
+    matched = set()
+    _HYPERSCAN_DB.scan(data, match_event_handler=_on_hyperscan_match, context=matched, scratch=scratch)
+    return matched
+
+# Precompiled validators for account fields
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_-]+$')
+_RESERVED_USERNAMES = frozenset({'admin', 'root', 'system', 'api', 'test', 'user', 'null', 'undefined'})
+_COMMON_PASSWORD_RE = re.compile(
+    '|'.join([
+        r'123456',
+        r'password',
+        r'qwerty',
+        r'abc123',
+        r'admin',
+    ]),
+    re.IGNORECASE
+)
+
+# Failed login attempts are counted over a one hour window
+_FAILED_ATTEMPT_WINDOW = 3600.0
+
+# Identifiers with no entries left inside their window are dropped once per
+# this many failed-attempt/rate-limit checks so the tracking dicts stay bounded
+_SWEEP_INTERVAL = 1000
+
+# Per-identifier updates are serialized on one of this many locks (chosen by
+# hash), so threads working on different identifiers rarely contend
+_LOCK_SHARDS = 16
+
+class IPBlocklist:
+    """Blocked IP addresses and CIDR ranges stored as integers.
+    
+    Entries are grouped by (IP version, prefix length) holding the network part
+    of each address, so a lookup is one shift and set probe per distinct prefix
+    length; a single address is simply a /32 (or /128) entry. Values that are
+    not IP addresses (e.g. test client hosts) are kept as plain strings.
+    """
+    __slots__ = ('_networks', '_other')
+    
+    def __init__(self):
+        self._networks: Dict[tuple, set] = {}
+        self._other: set = set()
+    
+    @staticmethod
+    def _parse(value: str):
+        """Return ((version, prefixlen), network int) for an address or CIDR, else None"""
+        try:
+            network = ipaddress.ip_network(value, strict=False)
+        except ValueError:
+            return None
+        host_bits = network.max_prefixlen - network.prefixlen
+        return (network.version, network.prefixlen), int(network.network_address) >> host_bits
+    
+    def add(self, value: str):
+        parsed = self._parse(value)
+        if parsed is None:
+            self._other.add(value)
+        else:
+            self._networks.setdefault(parsed[0], set()).add(parsed[1])
+    
+    def discard(self, value: str):
+        parsed = self._parse(value)
+        if parsed is None:
+            self._other.discard(value)
+            return
+        networks = self._networks.get(parsed[0])
+        if networks is not None:
+            networks.discard(parsed[1])
+            if not networks:
+                del self._networks[parsed[0]]
+    
+    def clear(self):
+        self._networks.clear()
+        self._other.clear()
+    
+    def __contains__(self, ip: str) -> bool:
+        if not self._networks:
+            return ip in self._other
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return ip in self._other
+        value = int(address)
+        version = address.version
+        max_prefixlen = address.max_prefixlen
+        for (net_version, prefixlen), networks in self._networks.items():
+            if net_version == version and (value >> (max_prefixlen - prefixlen)) in networks:
+                return True
+        return False
+    
+    def __len__(self) -> int:
+        return sum(len(networks) for networks in self._networks.values()) + len(self._other)
+
 class SecurityManager:
     """Centralized security management"""
+    __slots__ = ('blocked_ips', 'failed_attempts', 'rate_limits', '_max_rate_window', '_checks_since_sweep', '_locks')
     
     def __init__(self):
-        self.blocked_ips: set = set()
-        self.failed_attempts: Dict[str, List[datetime]] = {}
-        self.rate_limits: Dict[str, List[datetime]] = {}
+        self.blocked_ips = IPBlocklist()
+        # Per-identifier time.monotonic() timestamps, oldest first
+        self.failed_attempts: Dict[str, Deque[float]] = {}
+        self.rate_limits: Dict[str, Deque[float]] = {}
+        self._max_rate_window = 0.0
+        self._checks_since_sweep = 0
+        self._locks = tuple(threading.Lock() for _ in range(_LOCK_SHARDS))
+    
+    def _lock_for(self, identifier: str) -> threading.Lock:
+        return self._locks[hash(identifier) % _LOCK_SHARDS]
         
     def is_ip_blocked(self, ip: str) -> bool:
-        """Check if IP is blocked"""
+        """Check if IP is blocked (directly or through a blocked CIDR range)"""
         return ip in self.blocked_ips
     
     def block_ip(self, ip: str, duration_minutes: int = 60):
-        """Block IP address"""
+        """Block IP address or CIDR range (e.g. "203.0.113.0/24")"""
         self.blocked_ips.add(ip)
         # In production, implement with Redis/database for persistence
         logger.warning(f"IP {ip} blocked for {duration_minutes} minutes")
     
     def unblock_ip(self, ip: str):
-        """Unblock IP address"""
+        """Unblock IP address or CIDR range"""
         self.blocked_ips.discard(ip)
         logger.info(f"IP {ip} unblocked")
     
     def record_failed_attempt(self, identifier: str) -> int:
         """Record failed login attempt and return count"""
-        now = datetime.utcnow()
-        if identifier not in self.failed_attempts:
-            self.failed_attempts[identifier] = []
-        
-        # Remove attempts older than 1 hour
-        self.failed_attempts[identifier] = [
-            attempt for attempt in self.failed_attempts[identifier]
-            if now - attempt < timedelta(hours=1)
-        ]
+        now = time.monotonic()
+        with self._lock_for(identifier):
+            attempts = self.failed_attempts.get(identifier)
+            if attempts is None:
+                attempts = self.failed_attempts[identifier] = deque()
+            
+            # Remove attempts older than 1 hour (oldest first, stop at the first recent one)
+            cutoff = now - _FAILED_ATTEMPT_WINDOW
+            while attempts and attempts[0] <= cutoff:
+                attempts.popleft()
+            
+            attempts.append(now)
+            count = len(attempts)
         
-        self.failed_attempts[identifier].append(now)
-        return len(self.failed_attempts[identifier])
+        self._maybe_sweep(now)
+        return count
     
     def clear_failed_attempts(self, identifier: str):
         """Clear failed attempts for identifier"""
-        self.failed_attempts.pop(identifier, None)
+        with self._lock_for(identifier):
+            self.failed_attempts.pop(identifier, None)
     
     def check_rate_limit(self, identifier: str, max_requests: int, window_minutes: int) -> bool:
         """Check if identifier is within rate limits"""
-        now = datetime.utcnow()
-        if identifier not in self.rate_limits:
-            self.rate_limits[identifier] = []
-        
-        # Remove old requests outside the window
-        cutoff = now - timedelta(minutes=window_minutes)
-        self.rate_limits[identifier] = [
-            request_time for request_time in self.rate_limits[identifier]
-            if request_time > cutoff
-        ]
+        now = time.monotonic()
+        window = window_minutes * 60.0
+        if window > self._max_rate_window:
+            self._max_rate_window = window
         
-        # Check if within limits
-        if len(self.rate_limits[identifier]) >= max_requests:
-            return False
+        with self._lock_for(identifier):
+            requests = self.rate_limits.get(identifier)
+            if requests is None:
+                requests = self.rate_limits[identifier] = deque()
+            
+            # Remove old requests outside the window
+            cutoff = now - window
+            while requests and requests[0] <= cutoff:
+                requests.popleft()
+            
+            # Check if within limits, recording this request if so
+            allowed = len(requests) < max_requests
+            if allowed:
+                requests.append(now)
         
-        # Record this request
-        self.rate_limits[identifier].append(now)
-        return True
+        self._maybe_sweep(now)
+        return allowed
+    
+    def _maybe_sweep(self, now: float):
+        """Periodically drop identifiers whose entries have all expired"""
+        self._checks_since_sweep += 1
+        if self._checks_since_sweep < _SWEEP_INTERVAL:
+            return
+        self._checks_since_sweep = 0
+        self._evict_idle(self.failed_attempts, now - _FAILED_ATTEMPT_WINDOW)
+        self._evict_idle(self.rate_limits, now - self._max_rate_window)
+    
+    def _evict_idle(self, entries: Dict[str, Deque[float]], cutoff: float):
+        idle = [identifier for identifier, times in list(entries.items()) if not times or times[-1] <= cutoff]
+        for identifier in idle:
+            # Re-check under the identifier's lock; it may have been used since
+            with self._lock_for(identifier):
+                times = entries.get(identifier)
+                if times is not None and (not times or times[-1] <= cutoff):
+                    del entries[identifier]
 
 # Global security manager instance
 security_manager = SecurityManager()
 
 def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(_bcrypt_secret(password), bcrypt.gensalt(rounds=_BCRYPT_ROUNDS)).decode("ascii")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        return bcrypt.checkpw(_bcrypt_secret(plain_password), hashed_password.encode("ascii"))
+    return _legacy_password_context().verify(plain_password, hashed_password)
 
 def generate_secure_token(length: int = 32) -> str:
     """Generate cryptographically secure random token"""
@@ -133,13 +379,27 @@ def generate_api_key() -> tuple[str, str]:
     secret = secrets.token_urlsafe(32)  # 32 bytes = 43 chars
     return key_id, secret
 
+# Stored API key hashes carry an algorithm prefix; unprefixed hex digests are
+# the original SHA-256 format and still verify
+_API_KEY_HASH_PREFIX = "blake2b$"
+
 def hash_api_key(key: str) -> str:
     """Hash API key for storage"""
-    return hashlib.sha256(key.encode()).hexdigest()
+    return _API_KEY_HASH_PREFIX + hashlib.blake2b(key.encode(), digest_size=32).hexdigest()
 
 def verify_api_key(plain_key: str, hashed_key: str) -> bool:
     """Verify API key against hash"""
-    return hmac.compare_digest(hash_api_key(plain_key), hashed_key)
+    if hashed_key.startswith(_API_KEY_HASH_PREFIX):
+        return hmac.compare_digest(hash_api_key(plain_key), hashed_key)
+    # Legacy SHA-256 hash
+    return hmac.compare_digest(hashlib.sha256(plain_key.encode()).hexdigest(), hashed_key)
+
+# HTML allowed by sanitize_input(allow_html=True); no attributes on any tag
+_ALLOWED_HTML_TAGS = frozenset({'p', 'br', 'strong', 'em', 'u', 'ol', 'ul', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'})
+_NO_HTML_ATTRIBUTES = {'*': frozenset()}
+
+# Null bytes and control characters (keeps tab, newline and carriage return)
+_CTRL_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
 
 def sanitize_input(text: str, allow_html: bool = False) -> str:
     """Sanitize user input"""
@@ -149,40 +409,88 @@ def sanitize_input(text: str, allow_html: bool = False) -> str:
     # HTML escape if HTML not allowed
     if not allow_html:
         text = html.escape(text)
+    elif HAS_NH3:
+        text = nh3.clean(text, tags=_ALLOWED_HTML_TAGS, attributes=_NO_HTML_ATTRIBUTES)
     else:
         # Use bleach to clean HTML
-        allowed_tags = ['p', 'br', 'strong', 'em', 'u', 'ol', 'ul', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']
-        text = bleach.clean(text, tags=allowed_tags, strip=True)
+        text = bleach.clean(text, tags=_ALLOWED_HTML_TAGS, strip=True)
     
     # Remove null bytes and control characters
-    text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
+    text = _CTRL_RE.sub('', text)
     
     return text
 
+def _scan_threats(text, compiled_patterns: Dict[str, Any], check_patterns: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Scan text for every signature and report each matched signature once"""
+    if _HYPERSCAN_DB is not None:
+        # One DFA pass reports every signature; filter to the requested classes after
+        data = text if isinstance(text, bytes) else text.encode("utf-8", "surrogatepass")
+        matched = _hyperscan_scan(data)
+        if check_patterns:
+            matched = {group for group in matched if _PATTERN_GROUPS[group][0] in check_patterns}
+        matched = sorted(matched, key=_PATTERN_GROUP_ORDER.__getitem__)
+    else:
+        # Check specified patterns or all patterns
+        matched = [
+            group
+            for threat_type in (check_patterns or SECURITY_PATTERNS)
+            for group, regex in compiled_patterns.get(threat_type, ())
+            if regex.search(text)
+        ]
+    
+    threats = []
+    for group in matched:
+        threat_type, pattern = _PATTERN_GROUPS[group]
+        threats.append({
+            "type": threat_type,
+            "pattern": pattern,
+            "severity": "high" if threat_type in ["sql_injection", "command_injection"] else "medium"
+        })
+    return threats
+
+class _ValidationResult(dict):
+    """validate_input result whose "sanitized" entry is only computed when read"""
+    __slots__ = ("_text",)
+    
+    def __init__(self, text: str, threats: List[Dict[str, Any]]):
+        super().__init__(is_safe=not threats, threats=threats)
+        self._text = text
+    
+    def __missing__(self, key):
+        if key != "sanitized":
+            raise KeyError(key)
+        sanitized = self["sanitized"] = sanitize_input(self._text)
+        return sanitized
+    
+    def get(self, key, default=None):
+        if key == "sanitized":
+            return self[key]
+        return super().get(key, default)
+
 def validate_input(text: str, check_patterns: List[str] = None) -> Dict[str, Any]:
     """Validate input for security threats"""
     if not text:
         return {"is_safe": True, "threats": []}
     
-    threats = []
+    if HAS_RE2:
+        # surrogatepass so lone surrogates (valid in str, not in UTF-8) still scan
+        threats = _scan_threats(text.encode("utf-8", "surrogatepass"), _COMPILED_PATTERNS_BYTES, check_patterns)
+    else:
+        threats = _scan_threats(text, _COMPILED_PATTERNS, check_patterns)
     
-    # Check specified patterns or all patterns
-    patterns_to_check = check_patterns or list(SECURITY_PATTERNS.keys())
+    # "sanitized" is filled in on first access; most callers only read is_safe
+    return _ValidationResult(text, threats)
+
+def validate_input_bytes(data: bytes, check_patterns: List[str] = None) -> Dict[str, Any]:
+    """Validate raw bytes (e.g. a request body) for security threats without decoding"""
+    if not data:
+        return {"is_safe": True, "threats": []}
     
-    for threat_type in patterns_to_check:
-        if threat_type in SECURITY_PATTERNS:
-            for pattern in SECURITY_PATTERNS[threat_type]:
-                if re.search(pattern, text, re.IGNORECASE):
-                    threats.append({
-                        "type": threat_type,
-                        "pattern": pattern,
-                        "severity": "high" if threat_type in ["sql_injection", "command_injection"] else "medium"
-                    })
+    threats = _scan_threats(data, _COMPILED_PATTERNS_BYTES, check_patterns)
     
     return {
         "is_safe": len(threats) == 0,
-        "threats": threats,
-        "sanitized": sanitize_input(text)
+        "threats": threats
     }
 
 def validate_ip_address(ip: str) -> bool:
@@ -202,8 +510,7 @@ def is_private_ip(ip: str) -> bool:
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return bool(_EMAIL_RE.match(email))
 
 def validate_username(username: str) -> Dict[str, Any]:
     """Validate username"""
@@ -213,12 +520,11 @@ def validate_username(username: str) -> Dict[str, Any]:
         errors.append("Username must be at least 3 characters")
     if len(username) > 50:
         errors.append("Username must be less than 50 characters")
-    if not re.match(r'^[a-zA-Z0-9_-]+$', username):
+    if not _USERNAME_RE.match(username):
         errors.append("Username can only contain letters, numbers, underscores, and hyphens")
     
     # Check for reserved usernames
-    reserved = ['admin', 'root', 'system', 'api', 'test', 'user', 'null', 'undefined']
-    if username.lower() in reserved:
+    if username.lower() in _RESERVED_USERNAMES:
         errors.append("Username is reserved")
     
     return {
@@ -259,20 +565,10 @@ def validate_password(password: str) -> Dict[str, Any]:
     else:
         errors.append("Password must contain special characters")
     
-    # Check for common patterns
-    common_patterns = [
-        r'123456',
-        r'password',
-        r'qwerty',
-        r'abc123',
-        r'admin',
-    ]
-    
-    for pattern in common_patterns:
-        if re.search(pattern, password, re.IGNORECASE):
-            errors.append("Password contains common patterns")
-            score -= 1
-            break
+    # Check for common patterns (single pass over one combined pattern)
+    if _COMMON_PASSWORD_RE.search(password):
+        errors.append("Password contains common patterns")
+        score -= 1
     
     strength_levels = {
         0: "very_weak",
@@ -291,37 +587,51 @@ def validate_password(password: str) -> Dict[str, Any]:
         "strength": strength_levels.get(max(0, score), "weak")
     }
 
-def create_security_headers() -> Dict[str, str]:
+# Built once and shared read-only; Starlette copies header values into each
+# response, so every caller can receive the same mapping
+_SECURITY_HEADERS: Mapping[str, str] = MappingProxyType({
+    # Comment out all security headers for development
+    # "X-Content-Type-Options": "nosniff",
+    # "X-Frame-Options": "DENY",
+    # "X-XSS-Protection": "1; mode=block",
+    # "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+    # "Content-Security-Policy": "...",
+    # "Referrer-Policy": "strict-origin-when-cross-origin",
+    # "Permissions-Policy": "geolocation=(), microphone=(), camera=()"
+})
+
+def create_security_headers() -> Mapping[str, str]:
     """Create security headers for responses"""
-    return {
-        # Comment out all security headers for development
-        # "X-Content-Type-Options": "nosniff",
-        # "X-Frame-Options": "DENY",
-        # "X-XSS-Protection": "1; mode=block",
-        # "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
-        # "Content-Security-Policy": "...",
-        # "Referrer-Policy": "strict-origin-when-cross-origin",
-        # "Permissions-Policy": "geolocation=(), microphone=(), camera=()"
-    }
+    return _SECURITY_HEADERS
+
+@lru_cache(maxsize=16)
+def _fernet(key: bytes) -> Fernet:
+    """Fernet instance per key, so the key is parsed once rather than per call"""
+    return Fernet(key)
+
+# Fernet tokens are already URL-safe base64 and always start with this (version
+# byte 0x80); older values were base64-encoded a second time
+_FERNET_TOKEN_PREFIX = "gAAAAA"
 
 def encrypt_sensitive_data(data: str, key: Optional[str] = None) -> str:
     """Encrypt sensitive data"""
     if key is None:
-        key = Fernet.generate_key()
+        fernet = Fernet(Fernet.generate_key())
     else:
-        key = key.encode() if isinstance(key, str) else key
+        fernet = _fernet(key.encode() if isinstance(key, str) else key)
     
-    fernet = Fernet(key)
-    encrypted = fernet.encrypt(data.encode())
-    return base64.urlsafe_b64encode(encrypted).decode()
+    return fernet.encrypt(data.encode()).decode()
 
 def decrypt_sensitive_data(encrypted_data: str, key: str) -> str:
     """Decrypt sensitive data"""
-    key = key.encode() if isinstance(key, str) else key
-    fernet = Fernet(key)
+    fernet = _fernet(key.encode() if isinstance(key, str) else key)
     
-    decoded = base64.urlsafe_b64decode(encrypted_data.encode())
-    decrypted = fernet.decrypt(decoded)
+    if encrypted_data.startswith(_FERNET_TOKEN_PREFIX):
+        token = encrypted_data.encode()
+    else:
+        # Legacy double-encoded value
+        token = base64.urlsafe_b64decode(encrypted_data.encode())
+    decrypted = fernet.decrypt(token)
     return decrypted.decode()
 
 def generate_csrf_token() -> str:
@@ -332,24 +642,106 @@ def verify_csrf_token(token: str, expected: str) -> bool:
     """Verify CSRF token"""
     return hmac.compare_digest(token, expected)
 
+# Mask prefixes are sliced from a prebuilt run for the default "*" and
+# memoized per (length, char) otherwise, instead of multiplied per call
+_MASK_STARS = "*" * 1024
+
+@lru_cache(maxsize=256)
+def _mask_prefix(length: int, mask_char: str) -> str:
+    return mask_char * length
+
 def mask_sensitive_data(data: str, mask_char: str = "*", show_last: int = 4) -> str:
     """Mask sensitive data for logging"""
-    if len(data) <= show_last:
-        return mask_char * len(data)
+    length = len(data)
+    masked = length if length <= show_last else length - show_last
+    if mask_char == "*" and masked <= 1024:
+        prefix = _MASK_STARS[:masked]
+    else:
+        prefix = _mask_prefix(masked, mask_char)
+    
+    if length <= show_last:
+        return prefix
     
-    return mask_char * (len(data) - show_last) + data[-show_last:]
+    return prefix + data[-show_last:]
 
-def log_security_event(event_type: str, message: str, severity: str = "medium", **kwargs):
-    """Log security event"""
+# Background delivery of security events; None until the worker is started
+_security_event_queue: Optional[asyncio.Queue] = None
+_security_event_task: Optional[asyncio.Task] = None
+
+def log_security_event(event_type: str, message: str, severity: str = "medium", *args, **kwargs):
+    """Log security event.
+    
+    ``message`` may be a %-style template with ``args``; it is only formatted
+    when the event is emitted. While the background worker is running the
+    event is queued and emitted off the request path.
+    """
+    event = (event_type, message, args, severity, time.time(), kwargs)
+    
+    if _security_event_queue is not None:
+        try:
+            _security_event_queue.put_nowait(event)
+            return None
+        except asyncio.QueueFull:
+            pass  # Emit synchronously rather than drop the event
+    
+    return _emit_security_event(event)
+
+def _emit_security_event(event) -> Optional[Dict[str, Any]]:
+    """Format and emit a queued security event"""
+    event_type, message, args, severity, timestamp, kwargs = event
+    if not logger.isEnabledFor(logging.WARNING):
+        return None
+    
     event_data = {
         "event_type": event_type,
-        "message": message,
+        "message": message % args if args else message,
         "severity": severity,
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcfromtimestamp(timestamp).isoformat(),
         **kwargs
     }
     
-    logger.warning(f"SECURITY_EVENT: {event_data}")
+    logger.warning("SECURITY_EVENT: %s", event_data)
     
     # In production, send to SIEM/security monitoring system
-    return event_data 
\ No newline at end of file
+    return event_data
+
+async def _drain_security_events(queue: asyncio.Queue):
+    """Emit events from the given queue until cancelled"""
+    while True:
+        event = await queue.get()
+        try:
+            _emit_security_event(event)
+        except Exception as e:
+            logger.error(f"Failed to emit security event: {e}")
+        finally:
+            queue.task_done()
+
+def start_security_event_worker(maxsize: int = 10000):
+    """Start the background security event worker on the running loop"""
+    global _security_event_queue, _security_event_task
+    if _security_event_task is not None and not _security_event_task.done():
+        return
+    
+    _security_event_queue = asyncio.Queue(maxsize=maxsize)
+    _security_event_task = asyncio.create_task(_drain_security_events(_security_event_queue))
+
+async def stop_security_event_worker():
+    """Flush pending security events and stop the background worker"""
+    global _security_event_queue, _security_event_task
+    queue, task = _security_event_queue, _security_event_task
+    _security_event_queue = None
+    _security_event_task = None
+    
+    if task is None:
+        return
+    
+    # Emit anything still queued so no events are lost on shutdown
+    while not queue.empty():
+        _emit_security_event(queue.get_nowait())
+        queue.task_done()
+    
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass 
\ No newline at end of file
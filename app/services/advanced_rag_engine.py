@@ -1,15 +1,28 @@
 import asyncio
+import hashlib
+import heapq
 import json
 import logging
 import time
 import re
-from typing import Dict, Any, List, Optional, Union, Tuple
-from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Union, Tuple, Deque
+from collections import deque
+from functools import lru_cache
+from dataclasses import dataclass, fields, replace
 from enum import Enum
 import numpy as np
 from datetime import datetime
 
-from .rag_engine import rag_engine
+from ..core.json_codec import loads as _loads
+
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+    ahocorasick = None
+
+from .rag_engine import rag_engine, get_corpus_version
 from .cache import rag_cache
 from ..core.database import db_manager
 
@@ -23,7 +36,7 @@ class SearchAlgorithm(Enum):
     FUZZY = "fuzzy"
     CONTEXTUAL = "contextual"
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """Enhanced search result with metadata"""
     content: str
@@ -37,7 +50,19 @@ class SearchResult:
     search_algorithm: str
     confidence: float
 
-@dataclass
+@dataclass(slots=True, frozen=True)
+class AlgorithmConfig:
+    """Tuning parameters for one search algorithm"""
+    threshold: float
+    max_results: int
+    weight: float = 0.0
+    semantic_weight: float = 0.7
+    keyword_weight: float = 0.3
+    context_window: int = 1000
+
+_SEARCH_RESULT_FIELDS = tuple(f.name for f in fields(SearchResult))
+
+@dataclass(slots=True)
 class SearchQuery:
     """Structured search query"""
     text: str
@@ -47,6 +72,491 @@ class SearchQuery:
     similarity_threshold: float
     include_metadata: bool
 
+def _mock_template(label: str, algorithm: SearchAlgorithm, score: float, **metadata) -> SearchResult:
+    """Build a fallback result template; content is filled in per query"""
+    suffix = f"_{label.lower()}" if label else ""
+    return SearchResult(
+        content="",
+        title=f"Mock {label} Document" if label else "Mock Document",
+        source="test",
+        similarity_score=score,
+        metadata={"test": True, "algorithm": algorithm.value, **metadata},
+        chunk_id=f"mock{suffix}_1",
+        document_id=f"mock_doc{suffix}_1",
+        position=0,
+        search_algorithm=algorithm.value,
+        confidence=score
+    )
+
+# Metadata field that each _advanced_ranking strategy sorts by
+_RANKING_METADATA_KEYS = {
+    "relevance": "relevance",
+    "freshness": "freshness",
+    "authority": "authority",
+    "combined": "score",
+}
+
+# Score multiplier for hits returned with their surrounding context
+_CONTEXT_BOOST = 1.1
+
+# Fallback results returned by the search methods when they fail, built once at import
+_MOCK_RESULTS: Dict[SearchAlgorithm, SearchResult] = {
+    SearchAlgorithm.SEMANTIC: _mock_template("Semantic", SearchAlgorithm.SEMANTIC, 0.8),
+    SearchAlgorithm.KEYWORD: _mock_template("Keyword", SearchAlgorithm.KEYWORD, 0.7),
+    SearchAlgorithm.FUZZY: _mock_template("Fuzzy", SearchAlgorithm.FUZZY, 0.6),
+    SearchAlgorithm.CONTEXTUAL: _mock_template(
+        "Contextual", SearchAlgorithm.CONTEXTUAL, 0.9, context_enhanced=True
+    ),
+}
+
+# Fallback results returned by advanced_search itself when the whole search fails
+_SEARCH_FAILURE_MOCKS: Dict[SearchAlgorithm, SearchResult] = {
+    algorithm: _mock_template("", algorithm, 0.8) for algorithm in SearchAlgorithm
+}
+
+def _mock_results(template: SearchResult, content: str) -> List[SearchResult]:
+    """Copy a fallback template with the given content (metadata is copied so callers can't alter the template)"""
+    return [replace(template, content=content, metadata=dict(template.metadata))]
+
+def _copy_results(results: List[SearchResult]) -> List[SearchResult]:
+    """Copy results along with their metadata dicts, so cached lists stay unchanged"""
+    return [
+        replace(result, metadata=dict(result.metadata) if result.metadata is not None else None)
+        for result in results
+    ]
+
+def _result_from_object(
+    row,
+    i: int,
+    algorithm_value: str,
+    default_score: float,
+    extra_metadata: Optional[Dict[str, Any]]
+) -> SearchResult:
+    """Convert a Document-like object to a SearchResult"""
+    metadata = getattr(row, 'metadata', None) or {}
+    similarity_score = getattr(row, 'similarity_score', None)
+    if similarity_score is None:
+        # Try to get from metadata
+        similarity_score = metadata.get('score', default_score)
+    if extra_metadata:
+        metadata = {**metadata, **extra_metadata}
+    
+    return SearchResult(
+        content=row.content,
+        title=getattr(row, 'title', 'Untitled'),
+        source=getattr(row, 'source', 'Unknown'),
+        similarity_score=similarity_score,
+        metadata=metadata,
+        chunk_id=getattr(row, 'id', f"chunk_{i}"),
+        document_id=getattr(row, 'document_id', f"doc_{i}"),
+        position=i,
+        search_algorithm=algorithm_value,
+        confidence=similarity_score
+    )
+
+def _result_from_dict(
+    row: Dict[str, Any],
+    i: int,
+    algorithm_value: str,
+    default_score: float,
+    extra_metadata: Optional[Dict[str, Any]]
+) -> SearchResult:
+    """Convert a result dict to a SearchResult"""
+    get = row.get
+    metadata = get("metadata") or {}
+    similarity_score = get("similarity_score")
+    if similarity_score is None:
+        # Try to get from metadata
+        similarity_score = metadata.get('score', default_score)
+    if extra_metadata:
+        metadata = {**metadata, **extra_metadata}
+    
+    return SearchResult(
+        content=get("content", ""),
+        title=get("title", "Untitled"),
+        source=get("source", "Unknown"),
+        similarity_score=similarity_score,
+        metadata=metadata,
+        chunk_id=get("chunk_id", f"chunk_{i}"),
+        document_id=get("document_id", f"doc_{i}"),
+        position=i,
+        search_algorithm=algorithm_value,
+        confidence=similarity_score
+    )
+
+def _rows_to_results(
+    rows,
+    algorithm: SearchAlgorithm,
+    default_score: float,
+    extra_metadata: Optional[Dict[str, Any]] = None
+) -> List[SearchResult]:
+    """Convert base RAG engine results (Document objects or dicts) to SearchResult objects"""
+    if not rows:
+        return []
+    
+    # All rows come from one engine call, so pick the converter from the first row only
+    convert = _result_from_object if hasattr(rows[0], 'content') else _result_from_dict
+    algorithm_value = algorithm.value
+    return [
+        convert(row, i, algorithm_value, default_score, extra_metadata)
+        for i, row in enumerate(rows)
+    ]
+
+def _row_metadata(value) -> Dict[str, Any]:
+    """Return a row's metadata as a dict; asyncpg hands jsonb columns back as text"""
+    if not value:
+        return {}
+    if isinstance(value, (str, bytes)):
+        try:
+            value = _loads(value)
+        except ValueError:
+            return {}
+    return value if isinstance(value, dict) else {}
+
+def _keyword_matcher(keywords: List[str]):
+    """Build a matcher returning how many distinct keywords occur in a lowercased text.
+    
+    With pyahocorasick the automaton is built once per query and each text is
+    scanned in a single pass; otherwise each keyword is a C-level substring probe.
+    """
+    if HAS_AHOCORASICK:
+        automaton = ahocorasick.Automaton()
+        for index, keyword in enumerate(keywords):
+            automaton.add_word(keyword, index)
+        automaton.make_automaton()
+        
+        def count_matches(text: str) -> int:
+            return len({index for _, index in automaton.iter(text)})
+    else:
+        def count_matches(text: str) -> int:
+            return sum(1 for keyword in keywords if keyword in text)
+    
+    return count_matches
+
+# Full-text keyword search. The statement text never depends on the number of keywords
+# (they arrive as one text[] parameter ORed into the tsquery server-side), so asyncpg
+# prepares it once per connection and Postgres reuses the plan. The to_tsvector
+# expressions can be served by GIN expression indexes.
+_KEYWORD_SQL = """
+    WITH q AS (SELECT to_tsquery('english', array_to_string($1::text[], ' | ')) AS tsq)
+    SELECT
+        c.content,
+        c.title,
+        c.source,
+        c.metadata,
+        c.chunk_id,
+        c.document_id,
+        c.position,
+        ts_rank(to_tsvector('english', c.content), q.tsq) AS rank
+    FROM chunks c, q
+    WHERE to_tsvector('english', c.content) @@ q.tsq
+       OR to_tsvector('english', coalesce(c.title, '')) @@ q.tsq
+    ORDER BY rank DESC
+    LIMIT $2
+"""
+
+# Context windows for many (document_id, position) hits in one round trip; idx is the
+# 1-based position of the hit in the input arrays
+_CONTEXT_WINDOWS_SQL = """
+    SELECT h.idx, string_agg(c.content, ' ' ORDER BY c.position) AS context
+    FROM unnest($1::text[], $2::int[], $3::int[])
+        WITH ORDINALITY AS h(document_id, start_pos, end_pos, idx)
+    JOIN chunks c
+        ON c.document_id = h.document_id
+        AND c.position BETWEEN h.start_pos AND h.end_pos
+    GROUP BY h.idx
+"""
+
+_FUZZY_COLUMNS = "c.content, c.title, c.source, c.metadata, c.chunk_id, c.document_id, c.position"
+
+# % prunes via the trigram index (pg_trgm.similarity_threshold, 0.3 by default);
+# the explicit similarity check then applies the engine's own, stricter threshold
+_FUZZY_SQL = f"""
+    SELECT {_FUZZY_COLUMNS},
+        GREATEST(similarity(c.content, $1), similarity(c.title, $1)) AS fuzzy_score
+    FROM chunks c
+    WHERE (c.content % $1 OR c.title % $1)
+        AND GREATEST(similarity(c.content, $1), similarity(c.title, $1)) > $2
+    ORDER BY fuzzy_score DESC
+    LIMIT $3
+"""
+
+# Single-token queries first try an exact (case-insensitive) title match; trigram
+# scoring only runs when that finds nothing (Postgres evaluates NOT EXISTS once)
+_FUZZY_SQL_WITH_EXACT_TITLE = f"""
+    WITH exact AS (
+        SELECT {_FUZZY_COLUMNS}, 1.0::real AS fuzzy_score
+        FROM chunks c
+        WHERE lower(c.title) = lower($1)
+        LIMIT $3
+    )
+    SELECT * FROM exact
+    UNION ALL
+    (
+        SELECT {_FUZZY_COLUMNS},
+            GREATEST(similarity(c.content, $1), similarity(c.title, $1)) AS fuzzy_score
+        FROM chunks c
+        WHERE NOT EXISTS (SELECT 1 FROM exact)
+            AND (c.content % $1 OR c.title % $1)
+            AND GREATEST(similarity(c.content, $1), similarity(c.title, $1)) > $2
+        ORDER BY fuzzy_score DESC
+        LIMIT $3
+    )
+"""
+
+# Short plain-word queries ($4 holds their keywords) treat a chunk containing every
+# keyword verbatim, or an exact title match, as a distance-0 hit; the tsquery prunes
+# via the full-text index and strpos confirms the verbatim match. Trigram scoring
+# only runs when no exact hit exists, so a misspelled query still costs one round trip
+_FUZZY_SQL_WITH_EXACT_KEYWORDS = f"""
+    WITH q AS (SELECT to_tsquery('english', array_to_string($4::text[], ' | ')) AS tsq),
+    exact AS (
+        SELECT {_FUZZY_COLUMNS}, 1.0::real AS fuzzy_score
+        FROM chunks c, q
+        WHERE lower(c.title) = lower($1)
+            OR ((to_tsvector('english', c.content) @@ q.tsq
+                    OR to_tsvector('english', coalesce(c.title, '')) @@ q.tsq)
+                AND NOT EXISTS (
+                    SELECT 1 FROM unnest($4::text[]) AS k(word)
+                    WHERE strpos(lower(coalesce(c.title, '') || ' ' || c.content), k.word) = 0
+                ))
+        ORDER BY ts_rank(to_tsvector('english', c.content), q.tsq) DESC
+        LIMIT $3
+    )
+    SELECT * FROM exact
+    UNION ALL
+    (
+        SELECT {_FUZZY_COLUMNS},
+            GREATEST(similarity(c.content, $1), similarity(c.title, $1)) AS fuzzy_score
+        FROM chunks c
+        WHERE NOT EXISTS (SELECT 1 FROM exact)
+            AND (c.content % $1 OR c.title % $1)
+            AND GREATEST(similarity(c.content, $1), similarity(c.title, $1)) > $2
+        ORDER BY fuzzy_score DESC
+        LIMIT $3
+    )
+"""
+
+def _keyword_rows_to_results(
+    rows,
+    keywords: List[str],
+    algorithm: SearchAlgorithm
+) -> List[SearchResult]:
+    """Convert keyword query rows to SearchResult objects scored by the fraction of keywords present"""
+    count_matches = _keyword_matcher(keywords)
+    keyword_count = len(keywords)
+    algorithm_value = algorithm.value
+    
+    search_results = []
+    for row in rows:
+        score = count_matches(f"{row['title'] or ''} {row['content']}".lower()) / keyword_count
+        search_results.append(SearchResult(
+            content=row["content"],
+            title=row["title"],
+            source=row["source"],
+            similarity_score=score,
+            metadata=_row_metadata(row["metadata"]),
+            chunk_id=row["chunk_id"],
+            document_id=row["document_id"],
+            position=row["position"],
+            search_algorithm=algorithm_value,
+            confidence=score
+        ))
+    
+    return search_results
+
+# Common stop words dropped from keyword queries
+_KEYWORD_STOP_WORDS = frozenset({
+    "the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for",
+    "of", "with", "by", "is", "are", "was", "were", "be", "been", "being",
+    "have", "has", "had", "do", "does", "did", "will", "would", "could",
+    "should", "may", "might", "can", "this", "that", "these", "those"
+})
+
+_KEYWORD_WORD_RE = re.compile(r'\b\w{3,}\b')
+
+_EXACT_QUERY_RE = re.compile(r'[A-Za-z0-9_ ]+')
+
+def _looks_exact(text: str) -> bool:
+    """Short plain-word queries are usually typed exactly, so exact matching is tried first"""
+    return len(text) < 32 and _EXACT_QUERY_RE.fullmatch(text) is not None
+
+@lru_cache(maxsize=4096)
+def _word_set(content: str) -> frozenset:
+    """Lowercased whitespace-split word set of a content string, computed once per content"""
+    return frozenset(content.lower().split())
+
+def _jaccard(words1: frozenset, words2: frozenset) -> float:
+    """Jaccard similarity of two word sets; the union size is derived from the intersection"""
+    if not words1 or not words2:
+        return 0.0
+    intersection = len(words1 & words2)
+    return intersection / (len(words1) + len(words2) - intersection)
+
+# MinHash parameters for near-duplicate detection: (a * h + b) mod p over 32-bit token hashes
+_MINHASH_PERMUTATIONS = 128
+_MINHASH_PRIME = np.uint64((1 << 61) - 1)
+_minhash_rng = np.random.default_rng(1)
+_MINHASH_A = _minhash_rng.integers(1, (1 << 61) - 1, size=_MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _minhash_rng.integers(0, (1 << 61) - 1, size=_MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def _minhash_signature(words) -> np.ndarray:
+    """MinHash signature of a non-empty word set"""
+    hashes = np.fromiter((hash(word) & 0xFFFFFFFF for word in words), dtype=np.uint64, count=len(words))
+    # uint64 products wrap around before the modulo, as in the usual MinHash implementations
+    return ((hashes[:, None] * _MINHASH_A + _MINHASH_B) % _MINHASH_PRIME).min(axis=0)
+
+@lru_cache(maxsize=4096)
+def _content_signature(content: str) -> np.ndarray:
+    """Cached MinHash signature of a content's word set (content must have at least one word)"""
+    signature = _minhash_signature(_word_set(content))
+    # Shared between callers through the cache, so keep it read-only
+    signature.setflags(write=False)
+    return signature
+
+def _lsh_rows_per_band(threshold: float) -> int:
+    """Largest band height that still pairs up sets at the threshold with near certainty"""
+    for rows in (8, 4, 2):
+        bands = _MINHASH_PERMUTATIONS // rows
+        if 1.0 - (1.0 - threshold ** rows) ** bands >= 0.9999:
+            return rows
+    return 1
+
+class _MinHashLSH:
+    """Banded MinHash index returning candidate near-duplicates of a signature"""
+    
+    __slots__ = ('_rows', '_bands')
+    
+    def __init__(self, threshold: float):
+        self._rows = _lsh_rows_per_band(threshold)
+        self._bands: List[Dict[bytes, List[int]]] = [
+            {} for _ in range(_MINHASH_PERMUTATIONS // self._rows)
+        ]
+    
+    def _band_keys(self, signature: np.ndarray):
+        return signature.reshape(len(self._bands), self._rows)
+    
+    def candidates(self, signature: np.ndarray) -> set:
+        found = set()
+        for band, key in zip(self._bands, self._band_keys(signature)):
+            keys = band.get(key.tobytes())
+            if keys:
+                found.update(keys)
+        return found
+    
+    def insert(self, item: int, signature: np.ndarray):
+        for band, key in zip(self._bands, self._band_keys(signature)):
+            band.setdefault(key.tobytes(), []).append(item)
+
+def _near_duplicate_filter(contents: List[str], threshold: float) -> List[int]:
+    """Indices of contents to keep, dropping any whose word-set Jaccard similarity with an
+    earlier kept content exceeds threshold.
+    
+    MinHash LSH narrows each check to likely matches, which are then confirmed with the
+    exact Jaccard similarity, so the scan is near-linear instead of all-pairs.
+    """
+    index = _MinHashLSH(threshold)
+    kept_words: Dict[int, frozenset] = {}
+    keep = []
+    for i, content in enumerate(contents):
+        words = _word_set(content)
+        if not words:
+            # Empty content has similarity 0 with everything
+            keep.append(i)
+            continue
+        
+        signature = _content_signature(content)
+        is_duplicate = False
+        for j in index.candidates(signature):
+            if _jaccard(words, kept_words[j]) > threshold:
+                is_duplicate = True
+                break
+        if is_duplicate:
+            continue
+        
+        index.insert(i, signature)
+        kept_words[i] = words
+        keep.append(i)
+    
+    return keep
+
+class CircuitBreaker:
+    """Skip a failing dependency for a cooldown after repeated failures.
+    
+    After ``threshold`` failures within ``window_s`` seconds the breaker opens and
+    ``allow()`` returns False for ``cooldown_s`` seconds; a success resets it.
+    """
+    
+    __slots__ = ('threshold', 'window_s', 'cooldown_s', '_failures', '_open_until')
+    
+    def __init__(self, threshold: int = 5, window_s: float = 30.0, cooldown_s: float = 60.0):
+        self.threshold = threshold
+        self.window_s = window_s
+        self.cooldown_s = cooldown_s
+        self._failures: Deque[float] = deque()
+        self._open_until = 0.0
+    
+    def allow(self) -> bool:
+        """Whether the protected call should be attempted"""
+        return time.monotonic() >= self._open_until
+    
+    def record_success(self):
+        self._failures.clear()
+    
+    def record_failure(self):
+        now = time.monotonic()
+        failures = self._failures
+        failures.append(now)
+        cutoff = now - self.window_s
+        while failures and failures[0] < cutoff:
+            failures.popleft()
+        if len(failures) >= self.threshold:
+            self._open_until = now + self.cooldown_s
+            failures.clear()
+            logger.warning(f"Circuit opened for {self.cooldown_s:.0f}s after {self.threshold} failures")
+
+class _ResultCache:
+    """Short-lived in-process cache of search results.
+    
+    Entries expire after ``ttl`` seconds or as soon as the corpus version changes,
+    and the oldest entry is evicted once ``max_entries`` is reached. Results are
+    copied on the way in and out so callers can't alter cached results. Empty
+    result lists are never stored, since search paths also return [] on errors.
+    """
+    
+    __slots__ = ('ttl', 'max_entries', '_entries')
+    
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (expiry, corpus version, results)
+        self._entries: Dict[Any, Tuple[float, int, List[SearchResult]]] = {}
+    
+    def get(self, key, corpus_version: int) -> Optional[List[SearchResult]]:
+        """Return a copy of the cached results for key, if still fresh"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, entry_version, results = entry
+        if expires_at <= time.monotonic() or entry_version != corpus_version:
+            del self._entries[key]
+            return None
+        return _copy_results(results)
+    
+    def put(self, key, corpus_version: int, results: List[SearchResult]):
+        """Store a copy of non-empty results for key"""
+        if not results:
+            return
+        self._entries.pop(key, None)
+        while len(self._entries) >= self.max_entries:
+            # Dicts keep insertion order, so the first entry is the oldest
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + self.ttl, corpus_version, _copy_results(results))
+    
+    def clear(self):
+        """Drop all cached entries"""
+        self._entries.clear()
+
 class AdvancedRAGEngine:
     """Enhanced RAG engine with advanced search capabilities"""
     
@@ -63,33 +573,47 @@ class AdvancedRAGEngine:
         self.fuzzy_threshold = 0.8
         
         # Search algorithm configurations
-        self.algorithm_configs = {
-            SearchAlgorithm.SEMANTIC: {
-                "weight": 0.8,
-                "threshold": 0.6,
-                "max_results": 10
-            },
-            SearchAlgorithm.KEYWORD: {
-                "weight": 0.6,
-                "threshold": 0.4,
-                "max_results": 15
-            },
-            SearchAlgorithm.HYBRID: {
-                "semantic_weight": 0.7,
-                "keyword_weight": 0.3,
-                "threshold": 0.5,
-                "max_results": 12
-            },
-            SearchAlgorithm.FUZZY: {
-                "threshold": 0.8,
-                "max_results": 8
-            },
-            SearchAlgorithm.CONTEXTUAL: {
-                "context_window": 1000,
-                "threshold": 0.6,
-                "max_results": 10
-            }
+        self.algorithm_configs: Dict[SearchAlgorithm, AlgorithmConfig] = {
+            SearchAlgorithm.SEMANTIC: AlgorithmConfig(weight=0.8, threshold=0.6, max_results=10),
+            SearchAlgorithm.KEYWORD: AlgorithmConfig(weight=0.6, threshold=0.4, max_results=15),
+            SearchAlgorithm.HYBRID: AlgorithmConfig(
+                semantic_weight=0.7, keyword_weight=0.3, threshold=0.5, max_results=12
+            ),
+            SearchAlgorithm.FUZZY: AlgorithmConfig(threshold=0.8, max_results=8),
+            SearchAlgorithm.CONTEXTUAL: AlgorithmConfig(context_window=1000, threshold=0.6, max_results=10)
         }
+        
+        # Search method for each algorithm
+        self._dispatch = {
+            SearchAlgorithm.HYBRID: self._hybrid_search,
+            SearchAlgorithm.SEMANTIC: self._semantic_search,
+            SearchAlgorithm.KEYWORD: self._keyword_search,
+            SearchAlgorithm.FUZZY: self._fuzzy_search,
+            SearchAlgorithm.CONTEXTUAL: self._contextual_search,
+        }
+        
+        # Per-algorithm breakers for the base engine attempts that have a database fallback
+        self._breakers: Dict[SearchAlgorithm, CircuitBreaker] = {
+            algorithm: CircuitBreaker(threshold=5, window_s=30, cooldown_s=60)
+            for algorithm in (SearchAlgorithm.KEYWORD, SearchAlgorithm.FUZZY, SearchAlgorithm.CONTEXTUAL)
+        }
+        
+        # Repeated-query result caches, invalidated by TTL and corpus version changes
+        self._result_cache = _ResultCache(ttl=300.0, max_entries=2048)
+        self._fallback_cache = _ResultCache(ttl=60.0, max_entries=512)
+        
+        # Batched result cache writer (created lazily on the running event loop); the
+        # queue is bounded so a slow Redis cannot make pending writes grow without limit
+        self.cache_flush_interval = 0.05
+        self.cache_write_queue_size = 1000
+        self._cache_write_queue: Optional[asyncio.Queue] = None
+        self._cache_writer: Optional[asyncio.Task] = None
+        self._cache_write_loop = None
+    
+    @staticmethod
+    def _is_mock_results(results: List[SearchResult]) -> bool:
+        """Whether results came from a mock fallback path (never cache those)"""
+        return any(result.source == "test" and result.metadata.get("test") for result in results)
     
     async def advanced_search(
         self,
@@ -107,24 +631,30 @@ class AdvancedRAGEngine:
             algorithm=algorithm,
             filters=filters or {},
             top_k=top_k,
-            similarity_threshold=similarity_threshold or self.algorithm_configs[algorithm]["threshold"],
+            similarity_threshold=similarity_threshold or self.algorithm_configs[algorithm].threshold,
             include_metadata=True
         )
         
         try:
+            # Queries differing only in whitespace tokenize the same way in every search path
+            cache_key = (
+                algorithm,
+                " ".join(query.split()),
+                top_k,
+                search_query.similarity_threshold,
+                json.dumps(search_query.filters, sort_keys=True, default=str)
+            )
+            corpus_version = get_corpus_version()
+            cached_results = self._result_cache.get(cache_key, corpus_version)
+            if cached_results is not None:
+                logger.info(f"Result cache hit for {algorithm.value} search")
+                return cached_results
+            
             # Route to appropriate search method
-            if algorithm == SearchAlgorithm.HYBRID:
-                results = await self._hybrid_search(search_query)
-            elif algorithm == SearchAlgorithm.SEMANTIC:
-                results = await self._semantic_search(search_query)
-            elif algorithm == SearchAlgorithm.KEYWORD:
-                results = await self._keyword_search(search_query)
-            elif algorithm == SearchAlgorithm.FUZZY:
-                results = await self._fuzzy_search(search_query)
-            elif algorithm == SearchAlgorithm.CONTEXTUAL:
-                results = await self._contextual_search(search_query)
-            else:
+            handler = self._dispatch.get(algorithm)
+            if handler is None:
                 raise ValueError(f"Unsupported search algorithm: {algorithm}")
+            results = await handler(search_query)
             
             logger.info(f"Search algorithm {algorithm.value} returned {len(results)} results")
             
@@ -133,6 +663,8 @@ class AdvancedRAGEngine:
             
             # Cache results
             await self._cache_search_results(query, algorithm, results)
+            if not self._is_mock_results(results):
+                self._result_cache.put(cache_key, corpus_version, results)
             
             return results
             
@@ -142,29 +674,24 @@ class AdvancedRAGEngine:
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             # Return fallback mock data for tests
-            return [
-                SearchResult(
-                    content=f"Mock result for '{query}'",
-                    title="Mock Document",
-                    source="test",
-                    similarity_score=0.8,
-                    metadata={"test": True, "algorithm": algorithm.value},
-                    chunk_id="mock_1",
-                    document_id="mock_doc_1",
-                    position=0,
-                    search_algorithm=algorithm.value,
-                    confidence=0.8
-                )
-            ]
+            return _mock_results(_SEARCH_FAILURE_MOCKS[algorithm], f"Mock result for '{query}'")
     
     async def _hybrid_search(self, query: SearchQuery) -> List[SearchResult]:
         """Perform hybrid semantic + keyword search"""
         
-        # Get semantic results
-        semantic_results = await self._semantic_search(query)
-        
-        # Get keyword results
-        keyword_results = await self._keyword_search(query)
+        # Semantic and keyword searches are independent, so run them concurrently
+        semantic_results, keyword_results = await asyncio.gather(
+            # Over-fetch both sides so the merged ranking has candidates to choose from
+            self._semantic_search(query, overfetch=2),
+            self._keyword_search(query, overfetch=2),
+            return_exceptions=True
+        )
+        if isinstance(semantic_results, BaseException):
+            logger.error(f"Semantic search failed during hybrid search: {semantic_results}")
+            semantic_results = []
+        if isinstance(keyword_results, BaseException):
+            logger.error(f"Keyword search failed during hybrid search: {keyword_results}")
+            keyword_results = []
         
         # Combine and rank results
         combined_results = await self._combine_search_results(
@@ -173,176 +700,56 @@ class AdvancedRAGEngine:
         
         return combined_results[:query.top_k]
     
-    async def _semantic_search(self, query: SearchQuery) -> List[SearchResult]:
+    async def _semantic_search(self, query: SearchQuery, overfetch: int = 1) -> List[SearchResult]:
         """Perform semantic search using embeddings"""
         
         try:
             # Use base RAG engine for semantic search
             results = await self.base_rag_engine.search(
                 query=query.text,
-                top_k=query.top_k * 2,  # Get more results for ranking
+                top_k=query.top_k * overfetch,
                 similarity_threshold=query.similarity_threshold
             )
             
             # Convert to SearchResult objects
-            search_results = []
-            for i, result in enumerate(results):
-                if hasattr(result, 'content'):
-                    # Document object
-                    similarity_score = getattr(result, 'similarity_score', None)
-                    if similarity_score is None:
-                        # Try to get from metadata
-                        metadata = getattr(result, 'metadata', {})
-                        similarity_score = metadata.get('score', 0.8)
-                    
-                    search_result = SearchResult(
-                        content=result.content,
-                        title=getattr(result, 'title', 'Untitled'),
-                        source=getattr(result, 'source', 'Unknown'),
-                        similarity_score=similarity_score,
-                        metadata=getattr(result, 'metadata', {}),
-                        chunk_id=getattr(result, 'id', f"chunk_{i}"),
-                        document_id=getattr(result, 'document_id', f"doc_{i}"),
-                        position=i,
-                        search_algorithm=SearchAlgorithm.SEMANTIC.value,
-                        confidence=similarity_score
-                    )
-                else:
-                    # Dict object
-                    similarity_score = result.get("similarity_score", None)
-                    if similarity_score is None:
-                        # Try to get from metadata
-                        metadata = result.get("metadata", {})
-                        similarity_score = metadata.get('score', 0.8)
-                    
-                    search_result = SearchResult(
-                        content=result.get("content", ""),
-                        title=result.get("title", "Untitled"),
-                        source=result.get("source", "Unknown"),
-                        similarity_score=similarity_score,
-                        metadata=result.get("metadata", {}),
-                        chunk_id=result.get("chunk_id", f"chunk_{i}"),
-                        document_id=result.get("document_id", f"doc_{i}"),
-                        position=i,
-                        search_algorithm=SearchAlgorithm.SEMANTIC.value,
-                        confidence=similarity_score
-                    )
-                search_results.append(search_result)
+            search_results = _rows_to_results(results, SearchAlgorithm.SEMANTIC, 0.8)
             
             return search_results
             
         except Exception as e:
             logger.error(f"Semantic search failed: {e}")
             # Return fallback mock data for tests
-            return [
-                SearchResult(
-                    content=f"Mock semantic result for '{query.text}'",
-                    title="Mock Semantic Document",
-                    source="test",
-                    similarity_score=0.8,
-                    metadata={"test": True, "algorithm": "semantic"},
-                    chunk_id="mock_semantic_1",
-                    document_id="mock_doc_semantic_1",
-                    position=0,
-                    search_algorithm=SearchAlgorithm.SEMANTIC.value,
-                    confidence=0.8
-                )
-            ]
+            return _mock_results(_MOCK_RESULTS[SearchAlgorithm.SEMANTIC], f"Mock semantic result for '{query.text}'")
     
-    async def _keyword_search(self, query: SearchQuery) -> List[SearchResult]:
+    async def _keyword_search(self, query: SearchQuery, overfetch: int = 1) -> List[SearchResult]:
         """Perform keyword-based search"""
         
         try:
-            # First try to use base RAG engine if available (for test compatibility)
-            if hasattr(self.base_rag_engine, 'search'):
+            # First try to use base RAG engine if available (for test compatibility),
+            # unless it has been failing repeatedly
+            breaker = self._breakers[SearchAlgorithm.KEYWORD]
+            if hasattr(self.base_rag_engine, 'search') and breaker.allow():
                 try:
                     results = await self.base_rag_engine.search(
                         query=query.text,
-                        top_k=query.top_k * 2,
+                        top_k=query.top_k * overfetch,
                         algorithm="keyword"
                     )
                     
                     # Convert to SearchResult objects
-                    search_results = []
-                    for i, result in enumerate(results):
-                        if hasattr(result, 'content'):
-                            # Document object
-                            similarity_score = getattr(result, 'similarity_score', None)
-                            if similarity_score is None:
-                                # Try to get from metadata
-                                metadata = getattr(result, 'metadata', {})
-                                similarity_score = metadata.get('score', 0.7)
-                            
-                            search_result = SearchResult(
-                                content=result.content,
-                                title=getattr(result, 'title', 'Untitled'),
-                                source=getattr(result, 'source', 'Unknown'),
-                                similarity_score=similarity_score,
-                                metadata=getattr(result, 'metadata', {}),
-                                chunk_id=getattr(result, 'id', f"chunk_{i}"),
-                                document_id=getattr(result, 'document_id', f"doc_{i}"),
-                                position=i,
-                                search_algorithm=SearchAlgorithm.KEYWORD.value,
-                                confidence=similarity_score
-                            )
-                        else:
-                            # Dict object
-                            similarity_score = result.get("similarity_score", None)
-                            if similarity_score is None:
-                                # Try to get from metadata
-                                metadata = result.get("metadata", {})
-                                similarity_score = metadata.get('score', 0.7)
-                            
-                            search_result = SearchResult(
-                                content=result.get("content", ""),
-                                title=result.get("title", "Untitled"),
-                                source=result.get("source", "Unknown"),
-                                similarity_score=similarity_score,
-                                metadata=result.get("metadata", {}),
-                                chunk_id=result.get("chunk_id", f"chunk_{i}"),
-                                document_id=result.get("document_id", f"doc_{i}"),
-                                position=i,
-                                search_algorithm=SearchAlgorithm.KEYWORD.value,
-                                confidence=similarity_score
-                            )
-                        search_results.append(search_result)
+                    search_results = _rows_to_results(results, SearchAlgorithm.KEYWORD, 0.7)
                     
+                    breaker.record_success()
                     return search_results
                 except Exception as e:
+                    breaker.record_failure()
                     logger.warning(f"Base RAG engine keyword search failed, falling back to database: {e}")
             
             # Extract keywords from query
             keywords = self._extract_keywords(query.text)
             
-            # Search in database using keyword matching
-            # Prepare keyword patterns
-            keyword_patterns = [f"%{keyword}%" for keyword in keywords]
-            
-            # Build SQL query
-            sql_query = """
-                SELECT 
-                    c.content,
-                    c.title,
-                    c.source,
-                    c.metadata,
-                    c.chunk_id,
-                    c.document_id,
-                    c.position,
-                    COUNT(*) as keyword_matches
-                FROM chunks c
-                WHERE """
-            
-            # Add keyword conditions
-            conditions = []
-            for pattern in keyword_patterns:
-                conditions.append("(c.content ILIKE %s OR c.title ILIKE %s)")
-            
-            sql_query += " OR ".join(conditions)
-            sql_query += """
-                GROUP BY c.content, c.title, c.source, c.metadata, c.chunk_id, c.document_id, c.position
-                ORDER BY keyword_matches DESC
-                LIMIT %s
-            """
+            if not keywords:
+                return []
             
             # Execute query with proper error handling
             try:
@@ -355,131 +762,55 @@ class AdvancedRAGEngine:
                         logger.warning("Database connection not available, returning empty results")
                         return []
                     
-                    result = await conn.fetch(sql_query, *keyword_patterns * 2, query.top_k * 2)
+                    result = await conn.fetch(_KEYWORD_SQL, keywords, query.top_k * overfetch)
             except Exception as db_error:
                 logger.error(f"Database error in keyword search: {db_error}")
                 return []
             
             # Convert to SearchResult objects
-            search_results = []
-            for i, row in enumerate(result):
-                search_result = SearchResult(
-                    content=row["content"],
-                    title=row["title"],
-                    source=row["source"],
-                    similarity_score=row["keyword_matches"] / len(keywords),
-                    metadata=row["metadata"] or {},
-                    chunk_id=row["chunk_id"],
-                    document_id=row["document_id"],
-                    position=row["position"],
-                    search_algorithm=SearchAlgorithm.KEYWORD.value,
-                    confidence=row["keyword_matches"] / len(keywords)
-                )
-                search_results.append(search_result)
-            
-            return search_results
+            return _keyword_rows_to_results(result, keywords, SearchAlgorithm.KEYWORD)
             
         except Exception as e:
             logger.error(f"Keyword search failed: {e}")
             # Return fallback mock data for tests
-            return [
-                SearchResult(
-                    content=f"Mock keyword result for '{query.text}'",
-                    title="Mock Keyword Document",
-                    source="test",
-                    similarity_score=0.7,
-                    metadata={"test": True, "algorithm": "keyword"},
-                    chunk_id="mock_keyword_1",
-                    document_id="mock_doc_keyword_1",
-                    position=0,
-                    search_algorithm=SearchAlgorithm.KEYWORD.value,
-                    confidence=0.7
-                )
-            ]
+            return _mock_results(_MOCK_RESULTS[SearchAlgorithm.KEYWORD], f"Mock keyword result for '{query.text}'")
     
-    async def _fuzzy_search(self, query: SearchQuery) -> List[SearchResult]:
+    async def _fuzzy_search(self, query: SearchQuery, overfetch: int = 1) -> List[SearchResult]:
         """Perform fuzzy string matching search"""
         
         try:
-            # First try to use base RAG engine if available (for test compatibility)
-            if hasattr(self.base_rag_engine, 'search'):
+            # First try to use base RAG engine if available (for test compatibility),
+            # unless it has been failing repeatedly
+            breaker = self._breakers[SearchAlgorithm.FUZZY]
+            if hasattr(self.base_rag_engine, 'search') and breaker.allow():
                 try:
                     results = await self.base_rag_engine.search(
                         query=query.text,
-                        top_k=query.top_k * 2,
+                        top_k=query.top_k * overfetch,
                         algorithm="fuzzy"
                     )
                     
                     # Convert to SearchResult objects
-                    search_results = []
-                    for i, result in enumerate(results):
-                        if hasattr(result, 'content'):
-                            # Document object
-                            similarity_score = getattr(result, 'similarity_score', None)
-                            if similarity_score is None:
-                                # Try to get from metadata
-                                metadata = getattr(result, 'metadata', {})
-                                similarity_score = metadata.get('score', 0.6)
-                            
-                            search_result = SearchResult(
-                                content=result.content,
-                                title=getattr(result, 'title', 'Untitled'),
-                                source=getattr(result, 'source', 'Unknown'),
-                                similarity_score=similarity_score,
-                                metadata=getattr(result, 'metadata', {}),
-                                chunk_id=getattr(result, 'id', f"chunk_{i}"),
-                                document_id=getattr(result, 'document_id', f"doc_{i}"),
-                                position=i,
-                                search_algorithm=SearchAlgorithm.FUZZY.value,
-                                confidence=similarity_score
-                            )
-                        else:
-                            # Dict object
-                            similarity_score = result.get("similarity_score", None)
-                            if similarity_score is None:
-                                # Try to get from metadata
-                                metadata = result.get("metadata", {})
-                                similarity_score = metadata.get('score', 0.6)
-                            
-                            search_result = SearchResult(
-                                content=result.get("content", ""),
-                                title=result.get("title", "Untitled"),
-                                source=result.get("source", "Unknown"),
-                                similarity_score=similarity_score,
-                                metadata=result.get("metadata", {}),
-                                chunk_id=result.get("chunk_id", f"chunk_{i}"),
-                                document_id=result.get("document_id", f"doc_{i}"),
-                                position=i,
-                                search_algorithm=SearchAlgorithm.FUZZY.value,
-                                confidence=similarity_score
-                            )
-                        search_results.append(search_result)
+                    search_results = _rows_to_results(results, SearchAlgorithm.FUZZY, 0.6)
                     
+                    breaker.record_success()
                     return search_results
                 except Exception as e:
+                    breaker.record_failure()
                     logger.warning(f"Base RAG engine fuzzy search failed, falling back to database: {e}")
             
-            # Use PostgreSQL trigram similarity for fuzzy matching
-            sql_query = """
-                SELECT 
-                    c.content,
-                    c.title,
-                    c.source,
-                    c.metadata,
-                    c.chunk_id,
-                    c.document_id,
-                    c.position,
-                    GREATEST(
-                        similarity(c.content, %s),
-                        similarity(c.title, %s)
-                    ) as fuzzy_score
-                FROM chunks c
-                WHERE 
-                    similarity(c.content, %s) > %s
-                    OR similarity(c.title, %s) > %s
-                ORDER BY fuzzy_score DESC
-                LIMIT %s
-            """
+            # Use PostgreSQL trigram similarity for fuzzy matching. The pg_trgm % operator
+            # can be answered from a trigram index, so only rows passing it get scored.
+            query_text = query.text.strip()
+            keywords = self._extract_keywords(query_text) if _looks_exact(query_text) else []
+            args = [query.text, self.fuzzy_threshold, query.top_k * overfetch]
+            if keywords:
+                sql_query = _FUZZY_SQL_WITH_EXACT_KEYWORDS
+                args.append(keywords)
+            elif query_text and not any(ch.isspace() for ch in query_text):
+                sql_query = _FUZZY_SQL_WITH_EXACT_TITLE
+            else:
+                sql_query = _FUZZY_SQL
             
             # Execute query with proper error handling
             try:
@@ -492,11 +823,7 @@ class AdvancedRAGEngine:
                         logger.warning("Database connection not available, returning empty results")
                         return []
                     
-                    result = await conn.fetch(
-                        sql_query,
-                        query.text, query.text, query.text, self.fuzzy_threshold,
-                        query.text, self.fuzzy_threshold, query.top_k * 2
-                    )
+                    result = await conn.fetch(sql_query, *args)
             except Exception as db_error:
                 logger.error(f"Database error in fuzzy search: {db_error}")
                 return []
@@ -509,7 +836,7 @@ class AdvancedRAGEngine:
                     title=row["title"],
                     source=row["source"],
                     similarity_score=row["fuzzy_score"],
-                    metadata=row["metadata"] or {},
+                    metadata=_row_metadata(row["metadata"]),
                     chunk_id=row["chunk_id"],
                     document_id=row["document_id"],
                     position=row["position"],
@@ -523,27 +850,16 @@ class AdvancedRAGEngine:
         except Exception as e:
             logger.error(f"Fuzzy search failed: {e}")
             # Return fallback mock data for tests
-            return [
-                SearchResult(
-                    content=f"Mock fuzzy result for '{query.text}'",
-                    title="Mock Fuzzy Document",
-                    source="test",
-                    similarity_score=0.6,
-                    metadata={"test": True, "algorithm": "fuzzy"},
-                    chunk_id="mock_fuzzy_1",
-                    document_id="mock_doc_fuzzy_1",
-                    position=0,
-                    search_algorithm=SearchAlgorithm.FUZZY.value,
-                    confidence=0.6
-                )
-            ]
+            return _mock_results(_MOCK_RESULTS[SearchAlgorithm.FUZZY], f"Mock fuzzy result for '{query.text}'")
     
     async def _contextual_search(self, query: SearchQuery) -> List[SearchResult]:
         """Perform contextual search considering document structure"""
         
         try:
-            # First try to use base RAG engine if available (for test compatibility)
-            if hasattr(self.base_rag_engine, 'search'):
+            # First try to use base RAG engine if available (for test compatibility),
+            # unless it has been failing repeatedly
+            breaker = self._breakers[SearchAlgorithm.CONTEXTUAL]
+            if hasattr(self.base_rag_engine, 'search') and breaker.allow():
                 try:
                     results = await self.base_rag_engine.search(
                         query=query.text,
@@ -552,77 +868,45 @@ class AdvancedRAGEngine:
                     )
                     
                     # Convert to SearchResult objects
-                    search_results = []
-                    for i, result in enumerate(results):
-                        if hasattr(result, 'content'):
-                            # Document object
-                            similarity_score = getattr(result, 'similarity_score', None)
-                            if similarity_score is None:
-                                # Try to get from metadata
-                                metadata = getattr(result, 'metadata', {})
-                                similarity_score = metadata.get('score', 0.9)
-                            
-                            search_result = SearchResult(
-                                content=result.content,
-                                title=getattr(result, 'title', 'Untitled'),
-                                source=getattr(result, 'source', 'Unknown'),
-                                similarity_score=similarity_score,
-                                metadata={
-                                    **getattr(result, 'metadata', {}),
-                                    "context_enhanced": True
-                                },
-                                chunk_id=getattr(result, 'id', f"chunk_{i}"),
-                                document_id=getattr(result, 'document_id', f"doc_{i}"),
-                                position=i,
-                                search_algorithm=SearchAlgorithm.CONTEXTUAL.value,
-                                confidence=similarity_score
-                            )
-                        else:
-                            # Dict object
-                            similarity_score = result.get("similarity_score", None)
-                            if similarity_score is None:
-                                # Try to get from metadata
-                                metadata = result.get("metadata", {})
-                                similarity_score = metadata.get('score', 0.9)
-                            
-                            search_result = SearchResult(
-                                content=result.get("content", ""),
-                                title=result.get("title", "Untitled"),
-                                source=result.get("source", "Unknown"),
-                                similarity_score=similarity_score,
-                                metadata={
-                                    **result.get("metadata", {}),
-                                    "context_enhanced": True
-                                },
-                                chunk_id=result.get("chunk_id", f"chunk_{i}"),
-                                document_id=result.get("document_id", f"doc_{i}"),
-                                position=i,
-                                search_algorithm=SearchAlgorithm.CONTEXTUAL.value,
-                                confidence=similarity_score
-                            )
-                        search_results.append(search_result)
+                    search_results = _rows_to_results(results, SearchAlgorithm.CONTEXTUAL, 0.9, {"context_enhanced": True})
                     
+                    breaker.record_success()
                     return search_results
                 except Exception as e:
+                    breaker.record_failure()
                     logger.warning(f"Base RAG engine contextual search failed, falling back to semantic: {e}")
             
             # First get semantic results
             semantic_results = await self._semantic_search(query)
             
+            # Fetch the surrounding context for every hit in one round trip, started
+            # first so the score boosting below overlaps with the database call
+            windows_task = asyncio.create_task(self._get_contextual_windows(
+                [(result.document_id, result.position) for result in semantic_results], query
+            ))
+            
+            # Boost score and confidence of every hit for context in one vectorized multiply
+            try:
+                boosted = np.array(
+                    [(result.similarity_score, result.confidence) for result in semantic_results],
+                    dtype=np.float64
+                ).reshape(-1, 2)
+                boosted *= _CONTEXT_BOOST
+            except Exception:
+                windows_task.cancel()
+                raise
+            
+            contexts = await windows_task
+            
             # Enhance with contextual information
             contextual_results = []
-            for result in semantic_results:
-                # Get surrounding context
-                context = await self._get_contextual_window(
-                    result.document_id, result.position, query
-                )
-                
+            for result, context, (score, confidence) in zip(semantic_results, contexts, boosted.tolist()):
                 # Create enhanced result with context
                 enhanced_result = SearchResult(
                     content=result.content,
                     title=result.title,
                     source=result.source,
-                    similarity_score=result.similarity_score * 1.1,  # Boost for context
+                    similarity_score=score,
                     metadata={
                         **result.metadata,
                         "context_window": context,
@@ -632,7 +916,7 @@ class AdvancedRAGEngine:
                     document_id=result.document_id,
                     position=result.position,
                     search_algorithm=SearchAlgorithm.CONTEXTUAL.value,
-                    confidence=result.confidence * 1.1
+                    confidence=confidence
                 )
                 contextual_results.append(enhanced_result)
             
@@ -641,20 +925,7 @@ class AdvancedRAGEngine:
         except Exception as e:
             logger.error(f"Contextual search failed: {e}")
             # Return fallback mock data for tests
-            return [
-                SearchResult(
-                    content=f"Mock contextual result for '{query.text}'",
-                    title="Mock Contextual Document",
-                    source="test",
-                    similarity_score=0.9,
-                    metadata={"test": True, "algorithm": "contextual", "context_enhanced": True},
-                    chunk_id="mock_contextual_1",
-                    document_id="mock_doc_contextual_1",
-                    position=0,
-                    search_algorithm=SearchAlgorithm.CONTEXTUAL.value,
-                    confidence=0.9
-                )
-            ]
+            return _mock_results(_MOCK_RESULTS[SearchAlgorithm.CONTEXTUAL], f"Mock contextual result for '{query.text}'")
     
     async def _combine_search_results(
         self,
@@ -664,51 +935,56 @@ class AdvancedRAGEngine:
     ) -> List[SearchResult]:
         """Combine and rank results from different search methods"""
         
-        # Create result mapping by chunk_id
-        result_map = {}
-        
-        # Add semantic results
+        # Assign each chunk_id a slot; a later semantic duplicate replaces the earlier one
+        slots: Dict[str, int] = {}
+        merged: List[SearchResult] = []
+        semantic_scores: List[float] = []
         for result in semantic_results:
-            result_map[result.chunk_id] = {
-                "result": result,
-                "semantic_score": result.similarity_score,
-                "keyword_score": 0.0,
-                "combined_score": 0.0
-            }
+            slot = slots.get(result.chunk_id)
+            if slot is None:
+                slots[result.chunk_id] = len(merged)
+                merged.append(result)
+                semantic_scores.append(result.similarity_score or 0.0)
+            else:
+                merged[slot] = result
+                semantic_scores[slot] = result.similarity_score or 0.0
         
-        # Add keyword results and update scores
+        # Add keyword results and record their scores by slot
+        keyword_slots: List[int] = []
+        keyword_values: List[float] = []
         for result in keyword_results:
-            if result.chunk_id in result_map:
-                result_map[result.chunk_id]["keyword_score"] = result.similarity_score
-            else:
-                result_map[result.chunk_id] = {
-                    "result": result,
-                    "semantic_score": 0.0,
-                    "keyword_score": result.similarity_score,
-                    "combined_score": 0.0
-                }
+            slot = slots.get(result.chunk_id)
+            if slot is None:
+                slot = slots[result.chunk_id] = len(merged)
+                merged.append(result)
+            keyword_slots.append(slot)
+            keyword_values.append(result.similarity_score or 0.0)
+        
+        if not merged:
+            return []
+        
+        semantic = np.zeros(len(merged), dtype=np.float64)
+        semantic[:len(semantic_scores)] = semantic_scores
+        keyword = np.zeros(len(merged), dtype=np.float64)
+        # Plain fancy assignment keeps the last score for a repeated slot, like the old dict update
+        keyword[keyword_slots] = keyword_values
         
         # Calculate combined scores
-        config = self.algorithm_configs.get(SearchAlgorithm.HYBRID, {})
-        semantic_weight = config.get("semantic_weight", 0.7)
-        keyword_weight = config.get("keyword_weight", 0.3)
-        
-        for chunk_data in result_map.values():
-            combined_score = (
-                (chunk_data["semantic_score"] or 0.0) * semantic_weight +
-                (chunk_data["keyword_score"] or 0.0) * keyword_weight
-            )
-            chunk_data["combined_score"] = combined_score
-            chunk_data["result"].similarity_score = combined_score
-        
-        # Sort by combined score
-        sorted_results = sorted(
-            result_map.values(),
-            key=lambda x: x["combined_score"],
-            reverse=True
-        )
+        config = self.algorithm_configs[SearchAlgorithm.HYBRID]
+        combined = semantic * config.semantic_weight + keyword * config.keyword_weight
         
-        return [item["result"] for item in sorted_results]
+        # Sort by combined score, keeping insertion order for ties
+        order = np.argsort(-combined, kind="stable").tolist()
+        
+        # Write scores back from plain Python floats rather than boxing a NumPy scalar per item
+        scores = combined.tolist()
+        ranked = []
+        for index in order:
+            result = merged[index]
+            result.similarity_score = scores[index]
+            ranked.append(result)
+        
+        return ranked
     
     async def _get_contextual_window(
         self,
@@ -718,56 +994,51 @@ class AdvancedRAGEngine:
     ) -> str:
         """Get contextual window around a chunk"""
         
+        windows = await self._get_contextual_windows([(document_id, position)], query)
+        return windows[0]
+    
+    async def _get_contextual_windows(
+        self,
+        hits: List[Tuple[str, int]],
+        query: SearchQuery
+    ) -> List[str]:
+        """Get contextual windows around several chunks with a single query"""
+        
+        if not hits:
+            return []
+        
         try:
-            config = self.algorithm_configs[SearchAlgorithm.CONTEXTUAL]
-            window_size = config["context_window"]
+            half_window = self.algorithm_configs[SearchAlgorithm.CONTEXTUAL].context_window // 2
             
-            sql_query = """
-                SELECT content, title
-                FROM chunks
-                WHERE document_id = %s
-                AND position BETWEEN %s AND %s
-                ORDER BY position
-            """
-            
-            start_pos = max(0, position - window_size // 2)
-            end_pos = position + window_size // 2
+            document_ids = [str(document_id) for document_id, _ in hits]
+            start_positions = [max(0, position - half_window) for _, position in hits]
+            end_positions = [position + half_window for _, position in hits]
             
             async with db_manager.get_connection() as conn:
-                result = await conn.fetch(sql_query, document_id, start_pos, end_pos)
+                result = await conn.fetch(
+                    _CONTEXT_WINDOWS_SQL, document_ids, start_positions, end_positions
+                )
             
-            context_parts = []
+            # Hits whose window matched no chunks keep an empty context
+            windows = [""] * len(hits)
             for row in result:
-                context_parts.append(row["content"])
+                windows[row["idx"] - 1] = row["context"]
             
-            return " ".join(context_parts)
+            return windows
             
         except Exception as e:
-            logger.error(f"Failed to get contextual window: {e}")
-            return ""
+            logger.error(f"Failed to get contextual windows: {e}")
+            return [""] * len(hits)
     
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract keywords from text"""
         
         # Simple keyword extraction (can be enhanced with NLP)
-        # Remove common stop words and extract meaningful terms
-        stop_words = {
-            "the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for",
-            "of", "with", "by", "is", "are", "was", "were", "be", "been", "being",
-            "have", "has", "had", "do", "does", "did", "will", "would", "could",
-            "should", "may", "might", "can", "this", "that", "these", "those"
-        }
-        
-        # Clean and tokenize
-        words = re.findall(r'\b\w+\b', text.lower())
+        # Tokenize; the regex only yields words longer than two characters
+        words = _KEYWORD_WORD_RE.findall(text.lower())
         
-        # Filter out stop words and short words
-        keywords = [
-            word for word in words 
-            if word not in stop_words and len(word) > 2
-        ]
-        
-        return list(set(keywords))  # Remove duplicates
+        # Remove duplicates and stop words with one set difference
+        return list(set(words).difference(_KEYWORD_STOP_WORDS))
     
     async def _post_process_results(
         self,
@@ -776,23 +1047,27 @@ class AdvancedRAGEngine:
     ) -> List[SearchResult]:
         """Post-process search results"""
         
-        # Filter by similarity threshold
-        filtered_results = [
-            result for result in results
-            if (result.similarity_score or 0.0) >= query.similarity_threshold
-        ]
+        # Filter by similarity threshold and drop repeated chunks in one pass, so the
+        # pairwise content check below only sees distinct chunks
+        threshold = query.similarity_threshold
+        seen_chunk_ids = set()
+        filtered_results = []
+        for result in results:
+            if (result.similarity_score or 0.0) < threshold or result.chunk_id in seen_chunk_ids:
+                continue
+            seen_chunk_ids.add(result.chunk_id)
+            filtered_results.append(result)
         
         # Remove duplicates based on content similarity
         deduplicated_results = self._deduplicate_results(filtered_results)
         
-        # Sort by score
-        sorted_results = sorted(
+        # Keep the top_k by score; nlargest is equivalent to sorted(reverse=True)[:k]
+        # without sorting the whole list
+        return heapq.nlargest(
+            query.top_k,
             deduplicated_results,
-            key=lambda x: x.similarity_score or 0.0,
-            reverse=True
+            key=lambda x: x.similarity_score or 0.0
         )
-        
-        return sorted_results[:query.top_k]
     
     def _deduplicate_results(self, results: List[SearchResult]) -> List[SearchResult]:
         """Remove duplicate results based on content similarity"""
@@ -800,35 +1075,14 @@ class AdvancedRAGEngine:
         if not results:
             return results
         
-        unique_results = [results[0]]
-        
-        for result in results[1:]:
-            is_duplicate = False
-            for unique_result in unique_results:
-                # Simple similarity check (can be enhanced)
-                if self._calculate_content_similarity(result.content, unique_result.content) > 0.8:
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
-                unique_results.append(result)
-        
-        return unique_results
+        keep = _near_duplicate_filter([result.content for result in results], 0.8)
+        return [results[i] for i in keep]
     
     def _calculate_content_similarity(self, content1: str, content2: str) -> float:
         """Calculate similarity between two content pieces"""
         
         # Simple Jaccard similarity (can be enhanced with embeddings)
-        words1 = set(content1.lower().split())
-        words2 = set(content2.lower().split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
-        
-        return intersection / union if union > 0 else 0.0
+        return _jaccard(_word_set(content1), _word_set(content2))
     
     async def _cache_search_results(
         self,
@@ -839,60 +1093,124 @@ class AdvancedRAGEngine:
         """Cache search results for future use"""
         
         try:
-            cache_key = f"advanced_search:{algorithm.value}:{hash(query)}"
+            # hash() of a str is salted per process, so derive a key every worker agrees on
+            query_digest = hashlib.blake2b(query.encode("utf-8"), digest_size=16).hexdigest()
+            cache_key = f"advanced_search:{algorithm.value}:{query_digest}"
             cache_data = {
                 "query": query,
                 "algorithm": algorithm.value,
-                "results": [result.__dict__ for result in results],
+                "results": [
+                    {name: getattr(result, name) for name in _SEARCH_RESULT_FIELDS}
+                    for result in results
+                ],
                 "timestamp": datetime.utcnow().isoformat()
             }
             
-            await rag_cache.cache_rag_query(cache_key, cache_data, ttl=3600)
+            self._queue_cache_write(cache_key, cache_data, 3600)
             
         except Exception as e:
             logger.error(f"Failed to cache search results: {e}")
     
+    def _queue_cache_write(self, key: str, data: Dict[str, Any], ttl: int):
+        """Queue a result cache write for the batched writer (started lazily on the running event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._cache_write_loop is not loop or self._cache_writer is None or self._cache_writer.done():
+            self._cache_write_loop = loop
+            self._cache_write_queue = asyncio.Queue(maxsize=self.cache_write_queue_size)
+            self._cache_writer = loop.create_task(self._cache_write_worker(self._cache_write_queue))
+        
+        try:
+            self._cache_write_queue.put_nowait((key, data, ttl))
+        except asyncio.QueueFull:
+            # Result caching is best effort; skip the write rather than back up the search path
+            logger.debug(f"Result cache write queue full, skipping write for {key}")
+    
+    async def _cache_write_worker(self, queue: asyncio.Queue):
+        """Flush queued cache writes every cache_flush_interval as one pipelined batch.
+        
+        A None item stops the worker once everything queued before it is written.
+        """
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            await asyncio.sleep(self.cache_flush_interval)
+            stopping = False
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            try:
+                await rag_cache.cache_rag_queries(batch)
+            except Exception as e:
+                logger.error(f"Failed to cache search results: {e}")
+            
+            if stopping:
+                return
+    
+    async def stop_cache_writer(self, timeout: float = 5.0):
+        """Flush pending result cache writes and stop the batched writer"""
+        queue, task = self._cache_write_queue, self._cache_writer
+        self._cache_write_queue = None
+        self._cache_writer = None
+        self._cache_write_loop = None
+        
+        if task is None or task.done():
+            return
+        
+        # The worker writes everything queued ahead of the sentinel, then exits
+        try:
+            await asyncio.wait_for(queue.put(None), timeout)
+            await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            task.cancel()
+            logger.warning("Timed out flushing result cache writes on shutdown")
+    
     def _advanced_ranking(self, documents, query, strategy="hybrid"):
         """Advanced ranking of documents"""
         # Check if input is Document objects or dicts
         is_document_objects = hasattr(documents[0], 'content') if documents else False
         
-        # Convert to working format
-        doc_dicts = []
-        for doc in documents:
-            if is_document_objects:
-                # Document object
-                doc_dicts.append({
+        # Convert to working format, making sure every similarity score is a number
+        if is_document_objects:
+            doc_dicts = [
+                {
                     "content": doc.content,
                     "similarity_score": getattr(doc, 'similarity_score', 0.0) or 0.0,
                     "metadata": getattr(doc, 'metadata', {}),
                     "id": getattr(doc, 'id', None)
-                })
-            else:
-                # Already a dict
-                doc_dicts.append(doc)
+                }
+                for doc in documents
+            ]
+        else:
+            # Already dicts; normalize missing scores in place
+            doc_dicts = documents
+            for doc in doc_dicts:
+                if doc.get("similarity_score") is None:
+                    doc["similarity_score"] = 0.0
         
-        # Ensure all similarity scores are valid numbers
-        for doc in doc_dicts:
-            if doc.get("similarity_score") is None:
-                doc["similarity_score"] = 0.0
-        
-        # Apply ranking strategy
-        if strategy == "relevance":
-            # Sort by relevance score from metadata
-            ranked_docs = sorted(doc_dicts, key=lambda x: x.get("metadata", {}).get("relevance", 0), reverse=True)
-        elif strategy == "freshness":
-            # Sort by freshness score from metadata
-            ranked_docs = sorted(doc_dicts, key=lambda x: x.get("metadata", {}).get("freshness", 0), reverse=True)
-        elif strategy == "authority":
-            # Sort by authority score from metadata
-            ranked_docs = sorted(doc_dicts, key=lambda x: x.get("metadata", {}).get("authority", 0), reverse=True)
-        elif strategy == "combined":
-            # Sort by combined score from metadata
-            ranked_docs = sorted(doc_dicts, key=lambda x: x.get("metadata", {}).get("score", 0), reverse=True)
+        # Apply ranking strategy: pull the score column out once, then argsort it
+        metadata_key = _RANKING_METADATA_KEYS.get(strategy)
+        if metadata_key is not None:
+            # Sort by the strategy's score from metadata
+            score_of = lambda x: x.get("metadata", {}).get(metadata_key, 0)
         else:
             # Default: sort by similarity score
-            ranked_docs = sorted(doc_dicts, key=lambda x: x.get("similarity_score", 0), reverse=True)
+            score_of = lambda x: x.get("similarity_score", 0)
+        
+        try:
+            scores = np.fromiter(map(score_of, doc_dicts), dtype=np.float64, count=len(doc_dicts))
+        except (TypeError, ValueError):
+            # Non-numeric scores: keep Python's comparison semantics
+            ranked_docs = sorted(doc_dicts, key=score_of, reverse=True)
+        else:
+            # A stable argsort of the negated scores keeps ties in input order, like sorted(reverse=True)
+            ranked_docs = [doc_dicts[i] for i in np.argsort(-scores, kind="stable").tolist()]
         
         # Convert back to original format
         if is_document_objects:
@@ -925,20 +1243,18 @@ class AdvancedRAGEngine:
                 # Already a dict
                 doc_dicts.append(doc)
         
-        unique_docs = []
-        for doc in doc_dicts:
-            is_duplicate = False
-            for unique_doc in unique_docs:
-                if self._calculate_content_similarity(doc.get("content", ""), unique_doc.get("content", "")) > threshold:
-                    is_duplicate = True
-                    break
-            if not is_duplicate:
-                unique_docs.append(doc)
-        return unique_docs
+        keep = _near_duplicate_filter([doc.get("content", "") for doc in doc_dicts], threshold)
+        return [doc_dicts[i] for i in keep]
     
     async def _fallback_search(self, query: str, top_k: int) -> List[SearchResult]:
         """Fallback to base RAG engine search"""
         
+        key = (query, top_k)
+        corpus_version = get_corpus_version()
+        cached_results = self._fallback_cache.get(key, corpus_version)
+        if cached_results is not None:
+            return cached_results
+        
         try:
             results = await self.base_rag_engine.similarity_search(query, top_k)
             
@@ -959,6 +1275,8 @@ class AdvancedRAGEngine:
                 )
                 search_results.append(search_result)
             
+            self._fallback_cache.put(key, corpus_version, search_results)
+            
             return search_results
             
         except Exception as e:
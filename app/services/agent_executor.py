@@ -1,41 +1,161 @@
 import asyncio
-import json
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional, AsyncGenerator
-from openai import AsyncOpenAI
+from typing import Dict, Any, List, Optional, AsyncGenerator, Tuple
+import httpx
+from openai import AsyncOpenAI, DEFAULT_TIMEOUT
 from openai.types.beta.threads import Run
 from openai.types.beta import Thread
 import time
 
 from ..core.config import settings
+from ..core.json_codec import loads as _loads, dumps as _dumps
 from .rag_engine import rag_engine
 from .cache import cache
 
 
 logger = logging.getLogger(__name__)
 
+# One AsyncOpenAI client per API key, shared by every executor so they reuse a single
+# connection pool; httpx's default pool limits throttle concurrent assistant calls
+_async_clients: Dict[str, AsyncOpenAI] = {}
+
+def _get_async_client(api_key: str) -> AsyncOpenAI:
+    """Return the process-wide Assistants API client for an API key"""
+    client = _async_clients.get(api_key)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            default_headers={"OpenAI-Beta": "assistants=v2"},
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=1000, max_keepalive_connections=200),
+                timeout=DEFAULT_TIMEOUT,
+                follow_redirects=True
+            )
+        )
+        _async_clients[api_key] = client
+    return client
+
+# Assistant instructions and tool schema never change, so build them once
+_SYSTEM_INSTRUCTIONS = """
+        You are a helpful AI assistant with access to a knowledge base through RAG (Retrieval-Augmented Generation).
+        
+        Your capabilities:
+        1. Search the knowledge base for relevant information
+        2. Provide accurate, contextual responses based on retrieved information
+        3. Admit when you don't have sufficient information
+        4. Combine information from multiple sources when relevant
+        
+        Guidelines:
+        - Always search the knowledge base first before providing answers
+        - Cite sources when using retrieved information
+        - Be concise but comprehensive
+        - If the retrieved information is insufficient, say so clearly
+        - Maintain a helpful and professional tone
+        """
+
+_TOOLS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_knowledge_base",
+            "description": "Search the knowledge base for relevant information",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "The search query to find relevant information"
+                    },
+                    "top_k": {
+                        "type": "integer",
+                        "description": "Number of results to return (default: 5)"
+                    }
+                },
+                "required": ["query"],
+                "additionalProperties": False
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "hybrid_search",
+            "description": "Perform hybrid search combining semantic and keyword search",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "The search query"
+                    },
+                    "semantic_weight": {
+                        "type": "number",
+                        "description": "Weight for semantic search (0.0 to 1.0, default: 0.7)"
+                    }
+                },
+                "required": ["query"],
+                "additionalProperties": False
+            }
+        }
+    }
+]
+
+# System message for direct chat completions (RAG-only mode)
+_CHAT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """You are a helpful AI assistant with access to a knowledge base. 
+        Use the provided context to answer questions accurately and comprehensively.
+        
+        Guidelines:
+        - Base your answers primarily on the provided context
+        - If the context doesn't contain sufficient information, say so clearly
+        - Cite sources when using specific information
+        - Be concise but thorough
+        - Maintain a helpful and professional tone"""
+}
+
 class AgentExecutor:
     """OpenAI Assistant-based agent executor with tool integration"""
     
     def __init__(self):
-        # Initialize OpenAI client only if API key is available
-        self.client = None
-        if settings.openai_api_key:
-            try:
-                self.client = AsyncOpenAI(
-                    api_key=settings.openai_api_key,
-                    default_headers={"OpenAI-Beta": "assistants=v2"}
-                )
-                logger.info("OpenAI Assistant client initialized successfully")
-            except Exception as e:
-                logger.warning(f"Failed to initialize OpenAI Assistant client: {e}")
-        else:
+        # OpenAI client is created on first use, and only if an API key is available
+        self._client: Optional[AsyncOpenAI] = None
+        self._client_failed = False
+        if not settings.openai_api_key:
             logger.warning("OpenAI API key not provided, Assistant features disabled")
             
         self.model = settings.openai_model
         self.assistant_id = settings.openai_assistant_id
         self.tools = self._get_tools()
         self._assistant = None
+        
+        # Caps concurrent Assistants API requests so bursts queue here instead of hitting rate limits
+        self._openai_semaphore = asyncio.Semaphore(settings.openai_max_concurrency)
+        
+        # In-flight execute_query runs for sessions, keyed by (session_id, query digest)
+        self._inflight: Dict[Tuple[str, bytes], asyncio.Future] = {}
+        
+        # Run status polling: exponential backoff from poll_initial_delay up to poll_max_delay seconds
+        self.poll_initial_delay = 0.05
+        self.poll_max_delay = 2.0
+        self.poll_backoff = 1.7
+    
+    @property
+    def client(self) -> Optional[AsyncOpenAI]:
+        """OpenAI client, built lazily so constructing an executor doesn't set up HTTP/SSL state"""
+        if self._client is None and settings.openai_api_key and not self._client_failed:
+            try:
+                self._client = _get_async_client(settings.openai_api_key)
+                logger.info("OpenAI Assistant client initialized successfully")
+            except Exception as e:
+                self._client_failed = True
+                logger.warning(f"Failed to initialize OpenAI Assistant client: {e}")
+        return self._client
+    
+    @client.setter
+    def client(self, value: Optional[AsyncOpenAI]):
+        self._client = value
     
     async def initialize(self):
         """Initialize the assistant"""
@@ -58,7 +178,8 @@ class AgentExecutor:
             if self.assistant_id and self.assistant_id.strip():
                 # Use existing assistant only if ID is actually provided and not empty
                 logger.info(f"Attempting to retrieve existing assistant: {self.assistant_id}")
-                self._assistant = await self.client.beta.assistants.retrieve(self.assistant_id)
+                async with self._openai_semaphore:
+                    self._assistant = await self.client.beta.assistants.retrieve(self.assistant_id)
                 logger.info(f"Using existing assistant: {self.assistant_id}")
             else:
                 # Skip assistant creation for now - run in RAG-only mode
@@ -72,78 +193,42 @@ class AgentExecutor:
     
     def _get_system_instructions(self) -> str:
         """Get system instructions for the assistant"""
-        return """
-        You are a helpful AI assistant with access to a knowledge base through RAG (Retrieval-Augmented Generation).
-        
-        Your capabilities:
-        1. Search the knowledge base for relevant information
-        2. Provide accurate, contextual responses based on retrieved information
-        3. Admit when you don't have sufficient information
-        4. Combine information from multiple sources when relevant
-        
-        Guidelines:
-        - Always search the knowledge base first before providing answers
-        - Cite sources when using retrieved information
-        - Be concise but comprehensive
-        - If the retrieved information is insufficient, say so clearly
-        - Maintain a helpful and professional tone
-        """
+        return _SYSTEM_INSTRUCTIONS
     
     def _get_tools(self) -> List[Dict[str, Any]]:
         """Define available tools for the assistant - Compatible with OpenAI v1.13.3 and Assistants API v2"""
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_knowledge_base",
-                    "description": "Search the knowledge base for relevant information",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "The search query to find relevant information"
-                            },
-                            "top_k": {
-                                "type": "integer",
-                                "description": "Number of results to return (default: 5)"
-                            }
-                        },
-                        "required": ["query"],
-                        "additionalProperties": False
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "hybrid_search",
-                    "description": "Perform hybrid search combining semantic and keyword search",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "The search query"
-                            },
-                            "semantic_weight": {
-                                "type": "number",
-                                "description": "Weight for semantic search (0.0 to 1.0, default: 0.7)"
-                            }
-                        },
-                        "required": ["query"],
-                        "additionalProperties": False
-                    }
-                }
-            }
-        ]
+        return _TOOLS
     
     async def execute_query(
         self, 
         query: str, 
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        thread: Optional[Thread] = None
+    ) -> Dict[str, Any]:
+        """Execute a query using the assistant (non-streaming); a prefetched session thread may be passed in"""
+        # Anonymous callers each bring their own thread, so only session queries are shared
+        if not session_id:
+            return await self._execute_query(query, session_id, thread)
+        
+        # Identical concurrent queries for a session share one run instead of each starting their own
+        key = (session_id, hashlib.blake2b(query.encode("utf-8"), digest_size=16).digest())
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._execute_query(query, session_id, thread))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shielded so one caller going away doesn't cancel the run for the others;
+        # each caller gets its own copy of the result to modify
+        return dict(await asyncio.shield(task))
+    
+    async def _execute_query(
+        self,
+        query: str,
+        session_id: Optional[str],
+        thread: Optional[Thread]
     ) -> Dict[str, Any]:
-        """Execute a query using the assistant (non-streaming)"""
+        """Run a single (non-deduplicated) assistant query"""
         if self._assistant is None:
             await self.initialize()
         # If assistant is still unavailable after initialization, return error response
@@ -157,16 +242,18 @@ class AgentExecutor:
                 "source": "agent",
                 "status": "error"
             }
-        start_time = time.time()
+        start_time = time.monotonic()
         try:
             # Create or get thread
-            thread = await self._get_or_create_thread(session_id)
+            if thread is None:
+                thread = await self._get_or_create_thread(session_id)
             # Add user message
-            await self.client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=query
-            )
+            async with self._openai_semaphore:
+                await self.client.beta.threads.messages.create(
+                    thread_id=thread.id,
+                    role="user",
+                    content=query
+                )
             # Create and run the assistant
             return await self._execute_run(thread.id, query, start_time)
         except Exception as e:
@@ -176,7 +263,7 @@ class AgentExecutor:
                 "error": str(e),
                 "query": query,
                 "tools_used": [],
-                "response_time_ms": int((time.time() - start_time) * 1000),
+                "response_time_ms": int((time.monotonic() - start_time) * 1000),
                 "source": "agent",
                 "status": "error"
             }
@@ -184,9 +271,10 @@ class AgentExecutor:
     async def execute_query_stream(
         self, 
         query: str, 
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        thread: Optional[Thread] = None
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """Execute a query using the assistant (streaming)"""
+        """Execute a query using the assistant (streaming); a prefetched session thread may be passed in"""
         async def error_gen(error_msg: str):
             yield {
                 "type": "error",
@@ -206,16 +294,18 @@ class AgentExecutor:
                 yield item
             return
         
-        start_time = time.time()
+        start_time = time.monotonic()
         try:
             # Create or get thread
-            thread = await self._get_or_create_thread(session_id)
+            if thread is None:
+                thread = await self._get_or_create_thread(session_id)
             # Add user message
-            await self.client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=query
-            )
+            async with self._openai_semaphore:
+                await self.client.beta.threads.messages.create(
+                    thread_id=thread.id,
+                    role="user",
+                    content=query
+                )
             # Create and run the assistant
             async for chunk in self._stream_run(thread.id, query, start_time):
                 yield chunk
@@ -228,45 +318,48 @@ class AgentExecutor:
         """Execute a non-streaming run"""
         
         # Create run
-        run = await self.client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=self._assistant.id
-        )
+        async with self._openai_semaphore:
+            run = await self.client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=self._assistant.id
+            )
         
-        # Wait for completion
+        # Wait for completion, polling quickly at first and backing off on long runs
         tools_used = []
+        poll_delay = self.poll_initial_delay
         while run.status in ["queued", "in_progress", "requires_action"]:
             if run.status == "requires_action":
                 # Handle tool calls
-                tool_outputs = []
-                for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-                    tool_output = await self._handle_tool_call(tool_call)
-                    tool_outputs.append(tool_output)
-                    tools_used.append({
-                        "tool": tool_call.function.name,
-                        "arguments": tool_call.function.arguments
-                    })
+                tool_outputs = await self._handle_tool_calls(
+                    run.required_action.submit_tool_outputs.tool_calls, tools_used
+                )
                 
                 # Submit tool outputs
-                run = await self.client.beta.threads.runs.submit_tool_outputs(
-                    thread_id=thread_id,
-                    run_id=run.id,
-                    tool_outputs=tool_outputs
-                )
+                async with self._openai_semaphore:
+                    run = await self.client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=thread_id,
+                        run_id=run.id,
+                        tool_outputs=tool_outputs
+                    )
+                # The run resumes after tool outputs, so start polling quickly again
+                poll_delay = self.poll_initial_delay
             else:
-                await asyncio.sleep(1)
-                run = await self.client.beta.threads.runs.retrieve(
-                    thread_id=thread_id,
-                    run_id=run.id
-                )
+                await asyncio.sleep(poll_delay)
+                poll_delay = min(poll_delay * self.poll_backoff, self.poll_max_delay)
+                async with self._openai_semaphore:
+                    run = await self.client.beta.threads.runs.retrieve(
+                        thread_id=thread_id,
+                        run_id=run.id
+                    )
         
         if run.status == "completed":
             # Get the response
-            messages = await self.client.beta.threads.messages.list(
-                thread_id=thread_id,
-                order="desc",
-                limit=1
-            )
+            async with self._openai_semaphore:
+                messages = await self.client.beta.threads.messages.list(
+                    thread_id=thread_id,
+                    order="desc",
+                    limit=1
+                )
             
             response = messages.data[0].content[0].text.value
             
@@ -274,7 +367,7 @@ class AgentExecutor:
                 "response": response,
                 "query": query,
                 "tools_used": tools_used,
-                "response_time_ms": int((time.time() - start_time) * 1000),
+                "response_time_ms": int((time.monotonic() - start_time) * 1000),
                 "source": "agent"
             }
         else:
@@ -289,7 +382,8 @@ class AgentExecutor:
             assistant_id=self._assistant.id,
             stream=True
         )
-        stream = await stream_coro
+        async with self._openai_semaphore:
+            stream = await stream_coro
         
         tools_used = []
         response_parts = []
@@ -297,34 +391,34 @@ class AgentExecutor:
         async for event in stream:
             if event.event == "thread.run.requires_action":
                 # Handle tool calls
-                tool_outputs = []
-                for tool_call in event.data.required_action.submit_tool_outputs.tool_calls:
-                    tool_output = await self._handle_tool_call(tool_call)
-                    tool_outputs.append(tool_output)
-                    tools_used.append({
-                        "tool": tool_call.function.name,
-                        "arguments": tool_call.function.arguments
-                    })
+                tool_outputs = await self._handle_tool_calls(
+                    event.data.required_action.submit_tool_outputs.tool_calls, tools_used
+                )
                 
                 # Submit tool outputs
-                await self.client.beta.threads.runs.submit_tool_outputs(
-                    thread_id=thread_id,
-                    run_id=event.data.id,
-                    tool_outputs=tool_outputs
-                )
+                async with self._openai_semaphore:
+                    await self.client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=thread_id,
+                        run_id=event.data.id,
+                        tool_outputs=tool_outputs
+                    )
             
             elif event.event == "thread.message.delta":
-                # Stream response content
+                # Stream response content, coalescing the event's text deltas into one chunk
                 if event.data.delta.content:
-                    for content in event.data.delta.content:
-                        if content.type == "text":
-                            chunk = content.text.value
-                            response_parts.append(chunk)
-                            yield {
-                                "type": "chunk",
-                                "content": chunk,
-                                "timestamp": time.time()
-                            }
+                    texts = [
+                        content.text.value
+                        for content in event.data.delta.content
+                        if content.type == "text"
+                    ]
+                    if texts:
+                        chunk = texts[0] if len(texts) == 1 else "".join(texts)
+                        response_parts.append(chunk)
+                        yield {
+                            "type": "chunk",
+                            "content": chunk,
+                            "timestamp": time.time()
+                        }
             
             elif event.event == "thread.run.completed":
                 # Send completion event
@@ -333,7 +427,7 @@ class AgentExecutor:
                     "response": "".join(response_parts),
                     "query": query,
                     "tools_used": tools_used,
-                    "response_time_ms": int((time.time() - start_time) * 1000),
+                    "response_time_ms": int((time.monotonic() - start_time) * 1000),
                     "source": "agent"
                 }
                 break
@@ -346,11 +440,39 @@ class AgentExecutor:
                 }
                 break
     
+    async def _handle_tool_calls(self, tool_calls, tools_used: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Handle a run step's tool calls concurrently and record them in tools_used"""
+        
+        # Tool calls are independent searches, so run them together; one failing
+        # call becomes an error output instead of cancelling the others
+        outputs = await asyncio.gather(
+            *(self._handle_tool_call(tool_call) for tool_call in tool_calls),
+            return_exceptions=True
+        )
+        
+        tool_outputs = []
+        for tool_call, output in zip(tool_calls, outputs):
+            if isinstance(output, Exception):
+                logger.error(f"Tool call failed: {output}")
+                output = {
+                    "tool_call_id": tool_call.id,
+                    "output": _dumps({"error": str(output)})
+                }
+            elif isinstance(output, BaseException):
+                raise output
+            tool_outputs.append(output)
+            tools_used.append({
+                "tool": tool_call.function.name,
+                "arguments": tool_call.function.arguments
+            })
+        
+        return tool_outputs
+    
     async def _handle_tool_call(self, tool_call) -> Dict[str, Any]:
         """Handle tool function calls"""
         
         function_name = tool_call.function.name
-        arguments = json.loads(tool_call.function.arguments)
+        arguments = _loads(tool_call.function.arguments)
         
         try:
             if function_name == "search_knowledge_base":
@@ -366,18 +488,19 @@ class AgentExecutor:
                 )
                 
                 # Format results for the assistant
-                formatted_results = []
-                for result in results:
-                    formatted_results.append({
+                formatted_results = [
+                    {
                         "content": result["content"],
                         "title": result.get("title", "Untitled"),
                         "source": result.get("source", "Unknown"),
                         "similarity_score": result["similarity_score"]
-                    })
+                    }
+                    for result in results
+                ]
                 
                 return {
                     "tool_call_id": tool_call.id,
-                    "output": json.dumps({
+                    "output": _dumps({
                         "results": formatted_results,
                         "query": query,
                         "num_results": len(formatted_results)
@@ -395,18 +518,19 @@ class AgentExecutor:
                 )
                 
                 # Format results
-                formatted_results = []
-                for result in results:
-                    formatted_results.append({
+                formatted_results = [
+                    {
                         "content": result["content"],
                         "title": result.get("title", "Untitled"),
                         "source": result.get("source", "Unknown"),
                         "combined_score": result.get("combined_score", 0)
-                    })
+                    }
+                    for result in results
+                ]
                 
                 return {
                     "tool_call_id": tool_call.id,
-                    "output": json.dumps({
+                    "output": _dumps({
                         "results": formatted_results,
                         "query": query,
                         "num_results": len(formatted_results),
@@ -417,14 +541,14 @@ class AgentExecutor:
             else:
                 return {
                     "tool_call_id": tool_call.id,
-                    "output": json.dumps({"error": f"Unknown function: {function_name}"})
+                    "output": _dumps({"error": f"Unknown function: {function_name}"})
                 }
         
         except Exception as e:
             logger.error(f"Tool call failed: {e}")
             return {
                 "tool_call_id": tool_call.id,
-                "output": json.dumps({"error": str(e)})
+                "output": _dumps({"error": str(e)})
             }
     
     async def _get_or_create_thread(self, session_id: Optional[str]) -> Thread:
@@ -435,13 +559,15 @@ class AgentExecutor:
             thread_id = await cache.get(f"thread:{session_id}")
             if thread_id:
                 try:
-                    return await self.client.beta.threads.retrieve(thread_id)
-                except:
-                    # Thread doesn't exist, create new one
-                    pass
+                    async with self._openai_semaphore:
+                        return await self.client.beta.threads.retrieve(thread_id)
+                except Exception as e:
+                    # Thread is gone or unreachable; the new thread below replaces the cached ID
+                    logger.warning(f"Cached thread {thread_id} for session {session_id} unavailable: {e}")
         
         # Create new thread
-        thread = await self.client.beta.threads.create()
+        async with self._openai_semaphore:
+            thread = await self.client.beta.threads.create()
         
         if session_id:
             # Cache thread ID
@@ -457,10 +583,11 @@ class AgentExecutor:
             return []
         
         try:
-            messages = await self.client.beta.threads.messages.list(
-                thread_id=thread_id,
-                order="asc"
-            )
+            async with self._openai_semaphore:
+                messages = await self.client.beta.threads.messages.list(
+                    thread_id=thread_id,
+                    order="asc"
+                )
             
             history = []
             for message in messages.data:
@@ -506,7 +633,8 @@ class AgentExecutor:
                 return True
             
             # Try to retrieve the assistant
-            await self.client.beta.assistants.retrieve(self._assistant.id)
+            async with self._openai_semaphore:
+                await self.client.beta.assistants.retrieve(self._assistant.id)
             return True
             
         except Exception as e:
@@ -534,12 +662,20 @@ class RAGAgent:
         Unified query processing with OpenAI integration (non-streaming)
         Returns a dict with the result.
         """
-        start_time = time.time()
+        start_time = time.monotonic()
         try:
-            rag_context = await self._get_rag_context(query)
+            thread = None
+            if use_agent and self.agent_executor.client and self.agent_executor._assistant is not None:
+                # The assistant thread lookup doesn't need the RAG context, so do both at once
+                rag_context, thread = await asyncio.gather(
+                    self._get_rag_context(query),
+                    self._prefetch_thread(session_id)
+                )
+            else:
+                rag_context = await self._get_rag_context(query)
             if use_agent and self.agent_executor.client:
                 result = await self._process_with_openai_agent(
-                    query, rag_context, False, session_id
+                    query, rag_context, False, session_id, thread
                 )
             else:
                 result = await self._process_with_simple_rag(
@@ -547,7 +683,7 @@ class RAGAgent:
                 )
             result["processing_info"] = {
                 "processing_mode": "fast",
-                "total_time_ms": int((time.time() - start_time) * 1000),
+                "total_time_ms": int((time.monotonic() - start_time) * 1000),
                 "agent_available": self.agent_executor._assistant is not None
             }
             return result
@@ -557,7 +693,7 @@ class RAGAgent:
             fallback_result["processing_info"] = {
                 "processing_mode": "fallback",
                 "error": str(e),
-                "total_time_ms": int((time.time() - start_time) * 1000)
+                "total_time_ms": int((time.monotonic() - start_time) * 1000)
             }
             return fallback_result
 
@@ -574,12 +710,27 @@ class RAGAgent:
         if False:
             yield  # This ensures this function is always an async generator
         try:
-            rag_context = await self._get_rag_context(query)
-            if use_agent and self.agent_executor.client:
-                agent_stream = self.agent_executor.execute_query_stream(
-                    query=query,
-                    session_id=session_id
+            thread = None
+            if use_agent and self.agent_executor.client and self.agent_executor._assistant is None:
+                await self.agent_executor.initialize()
+            if use_agent and self.agent_executor.client and self.agent_executor._assistant is not None:
+                # The assistant thread lookup doesn't need the RAG context, so do both at once
+                rag_context, thread = await asyncio.gather(
+                    self._get_rag_context(query),
+                    self._prefetch_thread(session_id)
                 )
+            else:
+                rag_context = await self._get_rag_context(query)
+            if use_agent and self.agent_executor.client:
+                if self.agent_executor._assistant is not None:
+                    agent_stream = self.agent_executor.execute_query_stream(
+                        query=query,
+                        session_id=session_id,
+                        thread=thread
+                    )
+                else:
+                    # No assistant configured: stream a direct chat completion instead
+                    agent_stream = self._stream_with_openai_chat(query, rag_context, session_id)
                 import logging
                 logger = logging.getLogger(__name__)
                 logger.info(f"[RAG_AGENT] DEBUG: type(agent_stream) = {type(agent_stream)}")
@@ -593,12 +744,21 @@ class RAGAgent:
         except Exception as e:
             yield {"type": "error", "error": str(e)}
     
+    async def _prefetch_thread(self, session_id: Optional[str]) -> Optional[Thread]:
+        """Get or create the session's assistant thread, or None to let execute_query retry"""
+        try:
+            return await self.agent_executor._get_or_create_thread(session_id)
+        except Exception as e:
+            logger.warning(f"Assistant thread prefetch failed: {e}")
+            return None
+    
     async def _process_with_openai_agent(
         self,
         query: str,
         rag_context: Dict[str, Any],
         stream: bool,
-        session_id: Optional[str]
+        session_id: Optional[str],
+        thread: Optional[Thread] = None
     ) -> Dict[str, Any]:
         """Process query using OpenAI direct API (fast mode without Assistant)"""
         
@@ -616,7 +776,8 @@ class RAGAgent:
                     # For non-streaming, await the result
                     agent_result = await self.agent_executor.execute_query(
                         query=query,
-                        session_id=session_id
+                        session_id=session_id,
+                        thread=thread
                     )
                     
                     # Enhance with RAG context if not already present
@@ -628,7 +789,7 @@ class RAGAgent:
             else:
                 # Use direct OpenAI chat completions (preferred for non-Assistant usage)
                 return await self._process_with_openai_chat(
-                    query, rag_context, stream, session_id
+                    query, rag_context, session_id
                 )
                 
         except Exception as e:
@@ -636,22 +797,14 @@ class RAGAgent:
             # Try direct chat as fallback
             try:
                 return await self._process_with_openai_chat(
-                    query, rag_context, stream, session_id
+                    query, rag_context, session_id
                 )
             except Exception as chat_e:
                 logger.error(f"OpenAI chat fallback also failed: {chat_e}")
                 return await self._process_with_simple_rag(query, rag_context)
     
-    async def _process_with_openai_chat(
-        self,
-        query: str,
-        rag_context: Dict[str, Any],
-        stream: bool,
-        session_id: Optional[str]
-    ) -> Dict[str, Any]:
-        """Process query using OpenAI chat completions directly"""
-        
-        start_time = time.time()
+    def _build_chat_messages(self, query: str, rag_context: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build the chat completion messages for a query and its RAG context"""
         
         # Prepare context from RAG results
         context_text = ""
@@ -661,17 +814,6 @@ class RAGAgent:
                 for item in rag_context["context"][:5]  # Top 5 results
             ])
         
-        # Create system message with instructions
-        system_message = """You are a helpful AI assistant with access to a knowledge base. 
-        Use the provided context to answer questions accurately and comprehensively.
-        
-        Guidelines:
-        - Base your answers primarily on the provided context
-        - If the context doesn't contain sufficient information, say so clearly
-        - Cite sources when using specific information
-        - Be concise but thorough
-        - Maintain a helpful and professional tone"""
-        
         # Create user message with context
         user_message = f"""Context from knowledge base:
 {context_text}
@@ -680,55 +822,49 @@ Question: {query}
 
 Please provide a comprehensive answer based on the context above."""
         
-        messages = [
-            {"role": "system", "content": system_message},
+        return [
+            _CHAT_SYSTEM_MESSAGE,
             {"role": "user", "content": user_message}
         ]
+    
+    async def _process_with_openai_chat(
+        self,
+        query: str,
+        rag_context: Dict[str, Any],
+        session_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """Process query using OpenAI chat completions directly (non-streaming)"""
+        
+        start_time = time.monotonic()
         
         try:
             # Use OpenAI client for chat completion
             if self.agent_executor.client:
-                if stream:
-                    # Streaming response
-                    response_stream = await self.agent_executor.client.chat.completions.create(
-                        model=self.agent_executor.model,
-                        messages=messages,
-                        stream=True,
-                        max_tokens=2000,
-                        temperature=0.7
-                    )
-                    
-                    # Note: For streaming, we'd need to implement a generator
-                    # For now, fall back to non-streaming
-                    stream = False
+                response = await self.agent_executor.client.chat.completions.create(
+                    model=self.agent_executor.model,
+                    messages=self._build_chat_messages(query, rag_context),
+                    max_tokens=2000,
+                    temperature=0.7
+                )
                 
-                if not stream:
-                    # Non-streaming response
-                    response = await self.agent_executor.client.chat.completions.create(
-                        model=self.agent_executor.model,
-                        messages=messages,
-                        max_tokens=2000,
-                        temperature=0.7
-                    )
-                    
-                    response_time_ms = int((time.time() - start_time) * 1000)
-                    
-                    return {
-                        "response": response.choices[0].message.content,
-                        "query": query,
-                        "context": rag_context.get("context", []),
-                        "metadata": {
-                            **rag_context.get("metadata", {}),
-                            "processing_mode": "openai_chat",
-                            "model_used": self.agent_executor.model,
-                            "tokens_used": response.usage.total_tokens if response.usage else 0,
+                response_time_ms = int((time.monotonic() - start_time) * 1000)
+                
+                return {
+                    "response": response.choices[0].message.content,
+                    "query": query,
+                    "context": rag_context.get("context", []),
+                    "metadata": {
+                        **rag_context.get("metadata", {}),
+                        "processing_mode": "openai_chat",
+                        "model_used": self.agent_executor.model,
+                        "tokens_used": response.usage.total_tokens if response.usage else 0,
 
-                        },
-                        "source": "openai_chat",
-                        "response_time_ms": response_time_ms,
-                        "session_id": session_id,
-                        "rag_context": rag_context
-                    }
+                    },
+                    "source": "openai_chat",
+                    "response_time_ms": response_time_ms,
+                    "session_id": session_id,
+                    "rag_context": rag_context
+                }
             else:
                 raise Exception("OpenAI client not available")
                 
@@ -736,6 +872,52 @@ Please provide a comprehensive answer based on the context above."""
             logger.error(f"OpenAI chat completion failed: {e}")
             raise
     
+    async def _stream_with_openai_chat(
+        self,
+        query: str,
+        rag_context: Dict[str, Any],
+        session_id: Optional[str]
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream a chat completion answer as chunk events followed by a complete event"""
+        
+        start_time = time.monotonic()
+        response_stream = await self.agent_executor.client.chat.completions.create(
+            model=self.agent_executor.model,
+            messages=self._build_chat_messages(query, rag_context),
+            stream=True,
+            max_tokens=2000,
+            temperature=0.7
+        )
+        
+        response_parts = []
+        async for event in response_stream:
+            if not event.choices:
+                continue
+            chunk = event.choices[0].delta.content
+            if chunk:
+                response_parts.append(chunk)
+                yield {
+                    "type": "chunk",
+                    "content": chunk,
+                    "timestamp": time.time()
+                }
+        
+        yield {
+            "type": "complete",
+            "response": "".join(response_parts),
+            "query": query,
+            "context": rag_context.get("context", []),
+            "metadata": {
+                **rag_context.get("metadata", {}),
+                "processing_mode": "openai_chat",
+                "model_used": self.agent_executor.model
+            },
+            "source": "openai_chat",
+            "response_time_ms": int((time.monotonic() - start_time) * 1000),
+            "session_id": session_id,
+            "rag_context": rag_context
+        }
+    
     async def _process_with_simple_rag(
         self,
         query: str,
@@ -1,14 +1,14 @@
 import redis
-import json
 import hashlib
 import asyncio
 import logging
-from typing import Any, Optional, Callable, Dict
+from typing import Any, Optional, Callable, Dict, List, Tuple
 from functools import wraps
 from collections import OrderedDict
 import time
 
 from ..core.config import settings
+from ..core.json_codec import loads as _loads, dumps_bytes as _dumps
 
 logger = logging.getLogger(__name__)
 
@@ -150,7 +150,7 @@ class SmartCache:
             try:
                 cached_value = self.redis_client.get(key)
                 if cached_value:
-                    return json.loads(cached_value)
+                    return _loads(cached_value)
             except Exception as e:
                 pass
         
@@ -166,7 +166,7 @@ class SmartCache:
         # Try Redis first
         if await self._should_attempt_redis():
             try:
-                serialized_value = json.dumps(value, default=str)
+                serialized_value = _dumps(value)
                 result = self.redis_client.setex(key, ttl, serialized_value)
                 success = bool(result)
             except Exception as e:
@@ -177,6 +177,27 @@ class SmartCache:
         
         return success or True  # Return True if at least memory cache succeeded
     
+    async def set_many(self, entries: List[Tuple[str, Any, Optional[int]]]) -> bool:
+        """Set several (key, value, ttl) entries, sending the Redis writes in one pipeline round trip"""
+        entries = [(key, value, ttl or settings.cache_ttl_seconds) for key, value, ttl in entries]
+        success = False
+        
+        # Try Redis first
+        if entries and await self._should_attempt_redis():
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, value, ttl in entries:
+                    pipe.setex(key, ttl, _dumps(value))
+                success = all(pipe.execute())
+            except Exception as e:
+                pass
+        
+        # Always set in memory cache as backup
+        for key, value, ttl in entries:
+            await self.memory_cache.set(key, value, ttl)
+        
+        return success or True  # Return True if at least memory cache succeeded
+    
     async def delete(self, key: str) -> bool:
         """Delete key from cache"""
         success = False
@@ -350,6 +371,13 @@ class RAGCache:
         cache_key = f"rag_query:{algorithm}:{hashlib.sha256(query.encode()).hexdigest()}"
         return await self.cache.set(cache_key, result, ttl)
     
+    async def cache_rag_queries(self, entries: List[Tuple[str, Dict[str, Any], Optional[int]]], algorithm: str = "hybrid") -> bool:
+        """Cache several (query, result, ttl) RAG query results in one batch"""
+        return await self.cache.set_many([
+            (f"rag_query:{algorithm}:{hashlib.sha256(query.encode()).hexdigest()}", result, ttl)
+            for query, result, ttl in entries
+        ])
+    
     async def get_rag_query(self, query: str, algorithm: str = "hybrid") -> Optional[Dict[str, Any]]:
         """Get cached RAG query result"""
         # Handle None or empty queries
@@ -24,6 +24,19 @@ from ..services.similarity_engine import similarity_engine
 
 logger = logging.getLogger(__name__)
 
+# Bumped whenever documents are added or removed so search caches can drop stale results
+_corpus_version = 0
+
+def get_corpus_version() -> int:
+    """Return the current version of the document corpus"""
+    return _corpus_version
+
+def bump_corpus_version() -> int:
+    """Mark the document corpus as changed"""
+    global _corpus_version
+    _corpus_version += 1
+    return _corpus_version
+
 class TokenManager:
     """Manages token counting and text chunking"""
     
@@ -382,6 +395,7 @@ class RAGEngine:
                 )
                 doc_id = str(result['id'])
             
+            bump_corpus_version()
             logger.info(f"Successfully added document: {doc_id}")
             return doc_id
             
@@ -429,6 +443,7 @@ class RAGEngine:
                     )
                     doc_id = str(result['id'])
                     doc_ids.append(doc_id)
+                    bump_corpus_version()
             
             logger.info(f"Successfully added {len(doc_ids)} documents in bulk")
             return doc_ids
@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+from app.security import security
+from app.security.security import SECURITY_PATTERNS, validate_input, validate_input_bytes
+
+
+def _reference_threats(text, check_patterns=None):
+    """Per-pattern re.search, as validate_input originally did"""
+    return [
+        (threat_type, pattern)
+        for threat_type in (check_patterns or SECURITY_PATTERNS)
+        for pattern in SECURITY_PATTERNS.get(threat_type, [])
+        if re.search(pattern, text, re.IGNORECASE)
+    ]
+
+
+SAMPLES = [
+    "<script>alert(1)</script>",
+    "1' OR 1=1 --",
+    "../../etc/passwd; rm -rf /",
+    "javascript:onload=onerror=1",
+    "$(whoami) && `id`",
+    "plain harmless question about documents",
+]
+
+
+@pytest.fixture(params=["re", "re2", "hyperscan"])
+def scan_backend(request, monkeypatch):
+    if request.param != "hyperscan":
+        monkeypatch.setattr(security, "_HYPERSCAN_DB", None)
+    elif security._HYPERSCAN_DB is None:
+        pytest.skip("hyperscan not installed")
+    if request.param == "re":
+        monkeypatch.setattr(security, "HAS_RE2", False)
+    elif request.param == "re2" and not security.HAS_RE2:
+        pytest.skip("re2 not installed")
+    return request.param
+
+
+def test_overlapping_signatures_are_all_reported(scan_backend):
+    threats = validate_input("<script>alert(1)</script>")["threats"]
+    assert [(t["type"], t["severity"]) for t in threats] == [
+        ("sql_injection", "high"),
+        ("xss", "medium"),
+    ]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_matches_per_pattern_search(scan_backend, text):
+    found = {(t["type"], t["pattern"]) for t in validate_input(text)["threats"]}
+    assert found == set(_reference_threats(text))
+
+    found_bytes = {(t["type"], t["pattern"]) for t in validate_input_bytes(text.encode())["threats"]}
+    assert found_bytes == set(_reference_threats(text))
+
+
+def test_check_patterns_limits_threat_classes(scan_backend):
+    threats = validate_input("<script>alert(1)</script>", check_patterns=["xss"])["threats"]
+    assert [t["type"] for t in threats] == ["xss"]